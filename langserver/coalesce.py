@@ -0,0 +1,103 @@
+"""
+coalesce.py
+
+Request coalescing for concurrent async callers:
+- SingleFlight: identical in-flight calls share one task and its result
+- MicroBatcher: distinct items arriving within a short window are sent
+  to one batch call, per group (e.g. per embedding model)
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        # Shielded: one caller giving up does not cancel the others' result
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller was cancelled
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+class MicroBatcher:
+
+    def __init__(self, fn: Callable[[Hashable, List[Any]], Awaitable[List[Any]]],
+                 max_delay_ms: float = 2.0, max_batch: int = 32):
+        self.fn = fn
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, group: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        pending = self._pending.setdefault(group, [])
+        pending.append((item, fut))
+
+        if len(pending) >= self.max_batch:
+            self._flush(group)
+        elif len(pending) == 1:
+            self._timers[group] = loop.call_later(self.max_delay, self._flush, group)
+        return await fut
+
+    def _flush(self, group: Hashable) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = [(item, fut) for item, fut in self._pending.pop(group, []) if not fut.done()]
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(group, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, group: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.fn(group, [item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, fut in batch:
+                fut.cancel()
+            raise
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else None
+        }
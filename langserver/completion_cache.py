@@ -0,0 +1,161 @@
+"""
+completion_cache.py
+
+In-process cache for LLM completions:
+- Exact keys are (model, max_tokens, num_ctx, sha256(prompt))
+- TTL plus LRU bound by entry count
+- Optional semantic mode: a prompt whose embedding is close enough to a
+  cached prompt (cosine >= threshold, same model settings) reuses its completion
+- Hit/miss counters for monitoring
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import defaults as cfg
+
+
+class _Entry(NamedTuple):
+    text: str
+    expires_at: float
+    partition: str
+    vector: Optional[np.ndarray]
+
+
+class CompletionCache:
+
+    def __init__(self, max_entries: int = 0, ttl_seconds: float = 3600.0,
+                 semantic: bool = False, threshold: float = 0.97):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic and max_entries > 0
+        self.threshold = threshold
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # partition -> (keys, normalized prompt embeddings), rebuilt after changes
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def key(model: str, max_tokens: int, num_ctx: int, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model}|{max_tokens}|{num_ctx}|{digest}"
+
+    @staticmethod
+    def _partition(key: str) -> str:
+        return key.rsplit("|", 1)[0]
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.vector is not None:
+            self._matrices.pop(entry.partition, None)
+
+    def _live(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                # In semantic mode the miss is counted by semantic_get
+                if not self.semantic:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.text
+
+    def _matrix(self, partition: str) -> Tuple[List[str], Optional[np.ndarray]]:
+        if partition not in self._matrices:
+            keys = [k for k, e in self._entries.items() if e.partition == partition and e.vector is not None]
+            matrix = np.vstack([self._entries[k].vector for k in keys]) if keys else None
+            self._matrices[partition] = (keys, matrix)
+        return self._matrices[partition]
+
+    def semantic_get(self, key: str, vector: List[float]) -> Optional[str]:
+        if not self.semantic:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        with self._lock:
+            keys, matrix = self._matrix(self._partition(key))
+            if matrix is None or not norm or matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            scores = matrix @ (query / norm)
+            best = int(np.argmax(scores))
+            entry = self._live(keys[best]) if scores[best] >= self.threshold else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+            return entry.text
+
+    def put(self, key: str, text: str, vector: Optional[List[float]] = None) -> None:
+        if not self.enabled:
+            return
+        normalized = None
+        if self.semantic and vector:
+            normalized = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(normalized)
+            normalized = normalized / norm if norm else None
+
+        with self._lock:
+            self._drop(key)
+            entry = _Entry(text, time.monotonic() + self.ttl_seconds, self._partition(key), normalized)
+            self._entries[key] = entry
+            if normalized is not None:
+                self._matrices.pop(entry.partition, None)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            self.hits = self.semantic_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "semantic": self.semantic,
+            "threshold": self.threshold,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else None
+        }
+
+
+completion_cache = CompletionCache(
+    max_entries=cfg.COMPLETION_CACHE_SIZE if cfg.COMPLETION_CACHE_ENABLED else 0,
+    ttl_seconds=cfg.COMPLETION_CACHE_TTL_SECONDS,
+    semantic=cfg.COMPLETION_CACHE_SEMANTIC,
+    threshold=cfg.COMPLETION_CACHE_THRESHOLD
+)
@@ -0,0 +1,123 @@
+"""
+db_source.py
+
+Streams rows out of PostgreSQL for ingestion:
+- Shared ThreadedConnectionPool built from the DB_* settings; callers wait
+  for a free connection instead of failing when all DB_POOL_SIZE are in use
+- Server-side (named) cursor drained in fetchmany batches
+- Read-only transactions; tables and columns are quoted identifiers
+- Free-form queries must be a single SELECT (or WITH ... SELECT) statement.
+  DB_USER should still be a role with SELECT-only grants: the read-only
+  transaction is a second line of defence, not a permission boundary
+- Optional watermark column for incremental runs
+"""
+
+import re
+import uuid
+import asyncio
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple, AsyncIterator
+
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+
+import defaults as cfg
+
+DB_POOL_SIZE = cfg.DB_POOL_SIZE
+DB_FETCH_SIZE = cfg.DB_FETCH_SIZE
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+# getconn raises PoolError once every connection is checked out: callers queue here instead
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_db_pool(db_config: Dict[str, Any]) -> ThreadedConnectionPool:
+    # Blocking: opens the first connection
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(1, DB_POOL_SIZE, **db_config)
+        return _pool
+
+
+def close_db_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def jsonable(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _single_select(query: str) -> str:
+    # psycopg2 sends the statement as one simple query, which may hold several
+    # statements: a ';' could end the read-only transaction and run writes
+    query = query.strip().rstrip(";").strip()
+    if ";" in query:
+        raise ValueError("'query' must be a single SELECT statement without ';'.")
+    if not re.match(r"(select|with)\b", query, re.IGNORECASE):
+        raise ValueError("'query' must be a SELECT statement.")
+    return query
+
+
+def build_select(table: Optional[str], query: Optional[str], watermark_column: Optional[str],
+                 since: Any) -> Tuple[sql.Composable, List[Any]]:
+    if table:
+        source = sql.Identifier(*table.split("."))
+    elif query:
+        source = sql.SQL("({}) AS src").format(sql.SQL(_single_select(query)))
+    else:
+        raise ValueError("Either 'table' or 'query' is required.")
+
+    stmt = sql.SQL("SELECT * FROM {}").format(source)
+    params: List[Any] = []
+    if watermark_column:
+        column = sql.Identifier(watermark_column)
+        if since is not None:
+            stmt = sql.SQL("{} WHERE {} > %s").format(stmt, column)
+            params.append(since)
+        stmt = sql.SQL("{} ORDER BY {}").format(stmt, column)
+    return stmt, params
+
+
+async def astream_rows(db_config: Dict[str, Any], stmt: sql.Composable, params: List[Any],
+                       fetch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(DB_POOL_SIZE)
+
+    async with _slots:
+        pool = await asyncio.to_thread(get_db_pool, db_config)
+        conn = await asyncio.to_thread(pool.getconn)
+        try:
+            conn.set_session(readonly=True)
+            cur = conn.cursor(name=f"ingest_{uuid.uuid4().hex}")
+            try:
+                await asyncio.to_thread(cur.execute, stmt, params)
+                columns: Optional[List[str]] = None
+                while True:
+                    rows = await asyncio.to_thread(cur.fetchmany, fetch_size or DB_FETCH_SIZE)
+                    if not rows:
+                        break
+                    if columns is None:
+                        columns = [d[0] for d in cur.description]
+                    for row in rows:
+                        yield dict(zip(columns, row))
+            finally:
+                await asyncio.to_thread(cur.close)
+            await asyncio.to_thread(conn.rollback)
+        finally:
+            # The pool rolls back a connection that is returned mid-transaction
+            pool.putconn(conn)
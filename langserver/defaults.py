@@ -1,7 +1,7 @@
 
 import os
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 try:
     from dotenv import load_dotenv
@@ -60,10 +60,34 @@ LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
 # -----------------------------
 QDRANT_URL: str = os.getenv("QDRANT_URL", "http://127.0.0.1:6333")
 QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY", "")
+QDRANT_PREFER_GRPC: bool = _get_bool("QDRANT_PREFER_GRPC", False)
+QDRANT_GRPC_PORT: int = _get_int("QDRANT_GRPC_PORT", 6334)
+QDRANT_TIMEOUT: int = _get_int("QDRANT_TIMEOUT", 60)
 VECTOR_SIZE: int = _get_int("VECTOR_SIZE", 1536)
 COLLECTION_CACHE_TTL: int = _get_int("COLLECTION_CACHE_TTL", 10)
 DEFAULT_COLLECTION: str = os.getenv("DEFAULT_COLLECTION", "knowledge")
 QUERY_TOP_K: int = _get_int("QUERY_TOP_K", 5)
+SPARSE_VECTORS_ENABLED: bool = _get_bool("SPARSE_VECTORS_ENABLED", True)
+SPARSE_VECTOR_NAME: str = os.getenv("SPARSE_VECTOR_NAME", "text")
+HYBRID_PREFETCH_FACTOR: int = max(1, _get_int("HYBRID_PREFETCH_FACTOR", 4))
+BM25_K1: float = _get_float("BM25_K1", 1.2)
+BM25_B: float = _get_float("BM25_B", 0.75)
+BM25_AVG_DOC_LEN: float = _get_float("BM25_AVG_DOC_LEN", 256.0)
+# Collection storage (applied when a collection is created)
+COLLECTION_QUANTIZATION: str = os.getenv("COLLECTION_QUANTIZATION", "none").lower()  # none | scalar | binary
+QUANTIZATION_ALWAYS_RAM: bool = _get_bool("QUANTIZATION_ALWAYS_RAM", True)
+VECTORS_ON_DISK: bool = _get_bool("VECTORS_ON_DISK", False)
+HNSW_M: int = _get_int("HNSW_M", 0)  # 0 = Qdrant default
+HNSW_EF_CONSTRUCT: int = _get_int("HNSW_EF_CONSTRUCT", 0)
+HNSW_ON_DISK: bool = _get_bool("HNSW_ON_DISK", False)
+
+# Search tuning for quantized collections
+SEARCH_HNSW_EF: int = _get_int("SEARCH_HNSW_EF", 0)
+SEARCH_OVERSAMPLING: float = _get_float("SEARCH_OVERSAMPLING", 0.0)  # 0 = off
+SEARCH_RESCORE: bool = _get_bool("SEARCH_RESCORE", True)
+PAYLOAD_TEXT_INDEX_FIELDS: List[str] = [
+    f.strip() for f in os.getenv("PAYLOAD_TEXT_INDEX_FIELDS", "snippet,title").split(",") if f.strip()
+]
 
 # -----------------------------
 # LLM / Embeddings (Ollama)
@@ -76,10 +100,18 @@ LLM_CTX: int = _get_int("LLM_CTX", 4096)
 
 LLM_MAX_TOKENS: int = _get_int("LLM_MAX_TOKENS", 300)
 LLM_STREAM: bool = _get_bool("LLM_STREAM", False)
+STREAM_FLUSH_MS: float = max(0.0, _get_float("STREAM_FLUSH_MS", 50.0))
+STREAM_FLUSH_BYTES: int = max(1, _get_int("STREAM_FLUSH_BYTES", 256))
 
 OLLAMA_RETRY_COUNT: int = _get_int("OLLAMA_RETRY_COUNT", 3)
 OLLAMA_RETRY_DELAY: float = _get_float("OLLAMA_RETRY_DELAY", 2.0)
 
+OLLAMA_TIMEOUT: float = _get_float("OLLAMA_TIMEOUT", 60.0)
+OLLAMA_CONNECT_TIMEOUT: float = _get_float("OLLAMA_CONNECT_TIMEOUT", 10.0)
+OLLAMA_MAX_CONNECTIONS: int = _get_int("OLLAMA_MAX_CONNECTIONS", 100)
+OLLAMA_MAX_KEEPALIVE: int = _get_int("OLLAMA_MAX_KEEPALIVE", 20)
+OLLAMA_KEEPALIVE_EXPIRY: float = _get_float("OLLAMA_KEEPALIVE_EXPIRY", 30.0)
+
 # -----------------------------
 # Database Ingest
 # -----------------------------
@@ -88,6 +120,8 @@ DB_PORT: int = _get_int("DB_PORT", 5432)
 DB_NAME: str = os.getenv("DB_NAME", "rag_db")
 DB_USER: str = os.getenv("DB_USER", "ragadmin")
 DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
+DB_POOL_SIZE: int = max(1, _get_int("DB_POOL_SIZE", 4))
+DB_FETCH_SIZE: int = max(1, _get_int("DB_FETCH_SIZE", 1000))
 
 # -----------------------------
 # Ingestion Settings
@@ -95,7 +129,42 @@ DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
 CHUNK_SIZE: int = _get_int("CHUNK_SIZE", 800)
 CHUNK_OVERLAP: int = _get_int("CHUNK_OVERLAP", 120)
 EMBED_BATCH_SIZE: int = _get_int("EMBED_BATCH_SIZE", 64)
+EMBED_CACHE_ENABLED: bool = _get_bool("EMBED_CACHE_ENABLED", True)
+EMBED_CACHE_SIZE: int = _get_int("EMBED_CACHE_SIZE", 10000)
+EMBED_CACHE_DISK: bool = _get_bool("EMBED_CACHE_DISK", False)
+EMBED_CACHE_PATH: str = os.getenv("EMBED_CACHE_PATH", "/app/data/embed_cache.sqlite3")
+QUERY_CACHE_ENABLED: bool = _get_bool("QUERY_CACHE_ENABLED", True)
+QUERY_CACHE_SIZE: int = _get_int("QUERY_CACHE_SIZE", 1000)
+QUERY_CACHE_TTL_SECONDS: float = _get_float("QUERY_CACHE_TTL_SECONDS", 60.0)
+QUERY_CACHE_PATH: str = os.getenv("QUERY_CACHE_PATH", "/app/data/query_cache.sqlite3")
+COMPLETION_CACHE_ENABLED: bool = _get_bool("COMPLETION_CACHE_ENABLED", True)
+COMPLETION_CACHE_SIZE: int = _get_int("COMPLETION_CACHE_SIZE", 500)
+COMPLETION_CACHE_TTL_SECONDS: float = _get_float("COMPLETION_CACHE_TTL_SECONDS", 3600.0)
+COMPLETION_CACHE_SEMANTIC: bool = _get_bool("COMPLETION_CACHE_SEMANTIC", False)
+COMPLETION_CACHE_THRESHOLD: float = _get_float("COMPLETION_CACHE_THRESHOLD", 0.97)
+EMBED_CONCURRENCY: int = max(1, _get_int("EMBED_CONCURRENCY", 4))
+EMBED_MICROBATCH_MS: float = max(0.0, _get_float("EMBED_MICROBATCH_MS", 2.0))  # 0 = no micro-batching
+EMBED_MICROBATCH_MAX: int = max(1, _get_int("EMBED_MICROBATCH_MAX", 32))
 LOG_LINES_PER_CHUNK: int = _get_int("LOG_LINES_PER_CHUNK", 80)
+LOG_GROUPING: bool = _get_bool("LOG_GROUPING", False)
+LOG_GROUP_WINDOW_SECONDS: int = max(1, _get_int("LOG_GROUP_WINDOW_SECONDS", 300))
+UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR", "")  # empty = system temp dir
+MAX_ARCHIVE_MEMBERS: int = max(1, _get_int("MAX_ARCHIVE_MEMBERS", 10000))
+MAX_ARCHIVE_BYTES: int = max(1, _get_int("MAX_ARCHIVE_BYTES", 1024 * 1024 * 1024))  # uncompressed, per archive
+# uvicorn worker processes (uvicorn reads the same variable); each one has its own parse pool
+WEB_CONCURRENCY: int = max(1, _get_int("WEB_CONCURRENCY", 4))
+PARSE_WORKERS: int = max(0, _get_int("PARSE_WORKERS", 0))  # 0 = CPUs shared across WEB_CONCURRENCY
+PDF_PAGES_PER_TASK: int = max(1, _get_int("PDF_PAGES_PER_TASK", 8))
+TEXT_BYTES_PER_TASK: int = max(65536, _get_int("TEXT_BYTES_PER_TASK", 4 * 1024 * 1024))
+
+# -----------------------------
+# Background Jobs
+# -----------------------------
+JOBS_ENABLED: bool = _get_bool("JOBS_ENABLED", True)
+JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", "/app/data/jobs.sqlite3")
+JOB_WORKERS: int = max(1, _get_int("JOB_WORKERS", 1))
+JOB_LEASE_SECONDS: float = max(10.0, _get_float("JOB_LEASE_SECONDS", 120.0))
+JOB_MAX_ATTEMPTS: int = max(1, _get_int("JOB_MAX_ATTEMPTS", 3))
 
 # -----------------------------
 # Safety checks
@@ -0,0 +1,155 @@
+"""
+embedding_cache.py
+
+Content-addressed cache for embeddings:
+- Keys are (model, num_ctx, sha256(text))
+- In-memory LRU tier bounded by entry count, vectors kept as packed float32
+- Optional SQLite tier on disk, shared by all workers
+- Hit/miss counters for monitoring
+"""
+
+import os
+import array
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Iterable, Optional
+
+import defaults as cfg
+
+
+class EmbeddingCache:
+
+    def __init__(self, max_entries: int = 0, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path or None
+
+        # float32 arrays: ~4 bytes per dimension instead of a list of float objects
+        self._memory: "OrderedDict[str, array.array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.disk_path is not None
+
+    @staticmethod
+    def key(model: str, num_ctx: int, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}|{num_ctx}|{digest}"
+
+    # -----------------------------
+    # Disk tier (SQLite)
+    # -----------------------------
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        if self.disk_path is None:
+            return None
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.disk_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _decode(blob: bytes) -> array.array:
+        vec = array.array("f")
+        vec.frombytes(blob)
+        return vec
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def _remember(self, key: str, vector: array.array) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        if not self.enabled:
+            return found
+
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            missing = []
+            for k in unique:
+                vec = self._memory.get(k)
+                if vec is None:
+                    missing.append(k)
+                    continue
+                self._memory.move_to_end(k)
+                found[k] = vec.tolist()
+
+            conn = self._disk()
+            if conn is not None and missing:
+                for i in range(0, len(missing), 500):
+                    part = missing[i:i + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                        part
+                    ).fetchall()
+                    for k, blob in rows:
+                        vec = self._decode(blob)
+                        found[k] = vec.tolist()
+                        self._remember(k, vec)
+                        self.disk_hits += 1
+
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not self.enabled or not items:
+            return
+
+        with self._lock:
+            packed = {k: array.array("f", v) for k, v in items.items()}
+            for k, vec in packed.items():
+                self._remember(k, vec)
+
+            conn = self._disk()
+            if conn is not None:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(k, vec.tobytes()) for k, vec in packed.items()]
+                )
+                conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM embeddings")
+                conn.commit()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_path": self.disk_path,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+embedding_cache = EmbeddingCache(
+    max_entries=cfg.EMBED_CACHE_SIZE if cfg.EMBED_CACHE_ENABLED else 0,
+    disk_path=cfg.EMBED_CACHE_PATH if cfg.EMBED_CACHE_ENABLED and cfg.EMBED_CACHE_DISK else None
+)
@@ -6,36 +6,98 @@ Handles:
 - Query embeddings for vector search
 - LLM prompt generation with n8n-ready output
 - Robust retry logic and JSON/JSONL parsing
+- asyncio calls sharing one pooled HTTP client
+- Content-addressed embedding cache in front of Ollama
 """
 
 import time
 import json
-from typing import List, Dict
+import asyncio
+from typing import List, Dict, Optional, Tuple, AsyncIterator
 import httpx
 from schemas import GenerateResponse
+from embedding_cache import embedding_cache
+from completion_cache import completion_cache
+from coalesce import SingleFlight, MicroBatcher
 import defaults as cfg
 
 
 # -----------------------------
-# Internal Ollama request helper
+# Shared HTTP client (connection pool)
 # -----------------------------
-def _ollama_request(endpoint: str, payload: dict, timeout: int = 60) -> dict:
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _client_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=cfg.OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections=cfg.OLLAMA_MAX_KEEPALIVE,
+        keepalive_expiry=cfg.OLLAMA_KEEPALIVE_EXPIRY
+    )
+
+
+def _client_timeout(timeout: Optional[float]) -> httpx.Timeout:
+    return httpx.Timeout(timeout, connect=cfg.OLLAMA_CONNECT_TIMEOUT)
+
+
+def open_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            base_url=cfg.OLLAMA_BASE_URL,
+            limits=_client_limits(),
+            timeout=_client_timeout(cfg.OLLAMA_TIMEOUT)
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    client = _async_client
+    if client is None or client.is_closed:
+        client = open_async_client()
+    return client
+
+
+# -----------------------------
+# Internal Ollama request helpers
+# -----------------------------
+class _EndpointNotFound(Exception):
+    pass
+
+
+def _parse_response(response: httpx.Response, endpoint: str) -> dict:
+    if response.status_code == 404 and "model" not in response.text.lower():
+        raise _EndpointNotFound(endpoint)
+    response.raise_for_status()
+
+    text = response.text.strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        first_line = text.split("\n")[0]
+        return json.loads(first_line)
+
+
+async def _aollama_request(endpoint: str, payload: dict, timeout: float = None) -> dict:
     for attempt in range(cfg.OLLAMA_RETRY_COUNT):
         try:
-            with httpx.Client(timeout=timeout) as client:
-                response = client.post(f"{cfg.OLLAMA_BASE_URL}{endpoint}", json=payload)
-                response.raise_for_status()
-
-                text = response.text.strip()
-                try:
-                    return json.loads(text)
-                except json.JSONDecodeError:
-                    first_line = text.split("\n")[0]
-                    return json.loads(first_line)
+            response = await get_async_client().post(
+                endpoint, json=payload, timeout=_client_timeout(timeout or cfg.OLLAMA_TIMEOUT)
+            )
+            return _parse_response(response, endpoint)
 
+        except _EndpointNotFound:
+            raise
         except Exception as e:
             if attempt < cfg.OLLAMA_RETRY_COUNT - 1:
-                time.sleep(cfg.OLLAMA_RETRY_DELAY)
+                await asyncio.sleep(cfg.OLLAMA_RETRY_DELAY)
             else:
                 raise RuntimeError(
                     f"Ollama request failed after {cfg.OLLAMA_RETRY_COUNT} attempts: {e}"
@@ -45,92 +107,240 @@ def _ollama_request(endpoint: str, payload: dict, timeout: int = 60) -> dict:
 # -----------------------------
 # Embeddings
 # -----------------------------
-def embed_texts(texts: List[str], model: str = None, num_ctx: int = None) -> List[List[float]]:
-    model = model or cfg.EMBED_MODEL
-    embeddings = []
+_batch_embed_supported = True
 
-    for text in texts:
-        payload = {
-            "model": model,
-            "prompt": text,
-            "num_ctx": num_ctx or cfg.LLM_CTX
-        }
-        res = _ollama_request("/api/embeddings", payload)
 
-        try:
-            emb = res["embedding"]
-            if not emb:
-                raise ValueError(f"Empty embedding returned for text: {text}")
-        except KeyError:
-            raise ValueError(f"Invalid response from Ollama embeddings API: {res}")
+def _batch_payload(texts: List[str], model: str, num_ctx: int) -> dict:
+    return {
+        "model": model,
+        "input": texts,
+        "options": {"num_ctx": num_ctx}
+    }
+
+
+def _single_payload(text: str, model: str, num_ctx: int) -> dict:
+    return {
+        "model": model,
+        "prompt": text,
+        "num_ctx": num_ctx
+    }
 
-        embeddings.append(emb)
 
+def _parse_batch(texts: List[str], res: dict) -> List[List[float]]:
+    embeddings = res.get("embeddings")
+    if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+        raise ValueError(f"Invalid response from Ollama embed API: {res}")
+    for text, emb in zip(texts, embeddings):
+        if not emb:
+            raise ValueError(f"Empty embedding returned for text: {text}")
     return embeddings
 
 
-def embed_query(query: str, model: str = None, num_ctx: int = None) -> List[float]:
-    return embed_texts([query], model=model, num_ctx=num_ctx)[0]
+def _parse_single(text: str, res: dict) -> List[float]:
+    try:
+        emb = res["embedding"]
+        if not emb:
+            raise ValueError(f"Empty embedding returned for text: {text}")
+    except KeyError:
+        raise ValueError(f"Invalid response from Ollama embeddings API: {res}")
+
+    return emb
+
+
+async def _aembed_uncached(texts: List[str], model: str, num_ctx: int) -> List[List[float]]:
+    global _batch_embed_supported
+
+    if _batch_embed_supported:
+        try:
+            res = await _aollama_request("/api/embed", _batch_payload(texts, model, num_ctx))
+            return _parse_batch(texts, res)
+        except _EndpointNotFound:
+            _batch_embed_supported = False
+
+    embeddings = []
+    for text in texts:
+        res = await _aollama_request("/api/embeddings", _single_payload(text, model, num_ctx))
+        embeddings.append(_parse_single(text, res))
+    return embeddings
+
+
+def _cache_misses(texts: List[str], keys: List[str], cached: Dict[str, List[float]]) -> Dict[str, str]:
+    # key -> text for every distinct text not served by the cache
+    return {k: t for k, t in zip(keys, texts) if k not in cached}
+
+
+async def aembed_texts(texts: List[str], model: str = None, num_ctx: int = None) -> List[List[float]]:
+    model = model or cfg.EMBED_MODEL
+    num_ctx = num_ctx or cfg.LLM_CTX
+    if not texts:
+        return []
+
+    keys = [embedding_cache.key(model, num_ctx, t) for t in texts]
+    if embedding_cache.disk_path:
+        cached = await asyncio.to_thread(embedding_cache.get_many, keys)
+    else:
+        cached = embedding_cache.get_many(keys)
+    misses = _cache_misses(texts, keys, cached)
+
+    if misses:
+        vectors = await _aembed_uncached(list(misses.values()), model, num_ctx)
+        fresh = dict(zip(misses.keys(), vectors))
+        if embedding_cache.disk_path:
+            await asyncio.to_thread(embedding_cache.put_many, fresh)
+        else:
+            embedding_cache.put_many(fresh)
+        cached.update(fresh)
+
+    return [cached[k] for k in keys]
+
+
+async def _aembed_query_batch(group: Tuple[str, int], queries: List[str]) -> List[List[float]]:
+    model, num_ctx = group
+    return await aembed_texts(queries, model=model, num_ctx=num_ctx)
+
+
+# Identical concurrent queries share one embedding; distinct ones arriving within
+# EMBED_MICROBATCH_MS of each other are embedded in one /api/embed call.
+query_flights = SingleFlight()
+query_batcher = MicroBatcher(_aembed_query_batch, cfg.EMBED_MICROBATCH_MS, cfg.EMBED_MICROBATCH_MAX)
+
+
+async def aembed_query(query: str, model: str = None, num_ctx: int = None) -> List[float]:
+    group = (model or cfg.EMBED_MODEL, num_ctx or cfg.LLM_CTX)
+
+    async def embed():
+        if cfg.EMBED_MICROBATCH_MS > 0:
+            return await query_batcher.submit(group, query)
+        return (await _aembed_query_batch(group, [query]))[0]
+
+    return await query_flights.do((group, query), embed)
 
 
 # -----------------------------
 # LLM generation (CHAT Stream)
 # -----------------------------
-def stream_completion(prompt: str, model: str = None, max_tokens: int = None, num_ctx: int = None):
-    model = model or cfg.LLM_MODEL
-    max_tokens = max_tokens or cfg.LLM_MAX_TOKENS
-
-    payload = {
-        "model": model,
+def _generate_payload(prompt: str, model: str, max_tokens: int, num_ctx: int, stream: bool) -> dict:
+    return {
+        "model": model or cfg.LLM_MODEL,
         "prompt": prompt,
-        "max_tokens": max_tokens,
+        "max_tokens": max_tokens or cfg.LLM_MAX_TOKENS,
         "num_ctx": num_ctx or cfg.LLM_CTX,
-        "stream": True
+        "stream": stream
     }
 
-    buffer = ""
 
-    with httpx.Client(timeout=None) as client:
-        with client.stream("POST", f"{cfg.OLLAMA_BASE_URL}/api/generate", json=payload) as response:
-            response.raise_for_status()
-            for line in response.iter_lines():
-                if not line:
-                    continue
+# Buffered tokens are flushed once the oldest has waited STREAM_FLUSH_MS or
+# STREAM_FLUSH_BYTES have accumulated, whichever comes first.
+class _StreamBuffer:
+
+    def __init__(self, max_delay_ms: float = None, max_bytes: int = None):
+        self.max_delay = (cfg.STREAM_FLUSH_MS if max_delay_ms is None else max_delay_ms) / 1000.0
+        self.max_bytes = cfg.STREAM_FLUSH_BYTES if max_bytes is None else max_bytes
+        self._parts: List[str] = []
+        self._size = 0
+        self._since = 0.0
+
+    def __bool__(self) -> bool:
+        return bool(self._parts)
+
+    def add(self, chunk: str) -> None:
+        if not self._parts:
+            self._since = time.monotonic()
+        self._parts.append(chunk)
+        self._size += len(chunk.encode("utf-8"))
+
+    def remaining(self) -> Optional[float]:
+        # Seconds until the buffer is due by age; None while empty
+        if not self._parts:
+            return None
+        return max(0.0, self.max_delay - (time.monotonic() - self._since))
+
+    def due(self) -> bool:
+        return bool(self._parts) and (self._size >= self.max_bytes or self.remaining() == 0.0)
+
+    def take(self) -> str:
+        text = "".join(self._parts)
+        self._parts, self._size = [], 0
+        return text
+
+
+def _stream_frame(line: str) -> Optional[dict]:
+    if not line:
+        return None
+    try:
+        frame = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if "error" in frame:
+        raise RuntimeError(f"Ollama stream error: {frame['error']}")
+    return frame
+
+
+def _done_stats(frame: dict) -> dict:
+    stats = {k: frame[k] for k in (
+        "model", "done_reason", "total_duration", "load_duration", "prompt_eval_count",
+        "prompt_eval_duration", "eval_count", "eval_duration"
+    ) if k in frame}
+    if frame.get("eval_count") and frame.get("eval_duration"):
+        stats["tokens_per_second"] = round(frame["eval_count"] / frame["eval_duration"] * 1e9, 2)
+    return stats
+
+
+async def astream_completion(prompt: str, model: str = None, max_tokens: int = None,
+                             num_ctx: int = None, stats: Optional[dict] = None) -> AsyncIterator[str]:
+    # The final "done" frame's timing stats are copied into `stats` when given
+    payload = _generate_payload(prompt, model, max_tokens, num_ctx, stream=True)
+    buffer = _StreamBuffer()
+
+    client = get_async_client()
+    async with client.stream("POST", "/api/generate", json=payload, timeout=_client_timeout(None)) as response:
+        response.raise_for_status()
+
+        # Lines are read by a separate task, so a buffered token is flushed on time
+        # even while the model is slow to produce the next one
+        lines: asyncio.Queue = asyncio.Queue()
+
+        async def read_lines():
+            try:
+                async for line in response.aiter_lines():
+                    await lines.put(line)
+            finally:
+                await lines.put(None)
+
+        reader = asyncio.create_task(read_lines())
+        try:
+            while True:
                 try:
-                    j = json.loads(line)
-                    chunk = j.get("response", "")
-                    if not chunk:
-                        continue
-
-                    buffer += chunk
-                    if buffer.endswith((" ", ".", "?", "!", ",", ";", ":")):
-                        yield buffer
-                        buffer = ""
-                except Exception:
+                    line = await asyncio.wait_for(lines.get(), timeout=buffer.remaining())
+                except asyncio.TimeoutError:
+                    yield buffer.take()
                     continue
+                if line is None:
+                    await reader  # re-raises a read error
+                    break
+
+                frame = _stream_frame(line)
+                if frame is None:
+                    continue
+                if frame.get("response"):
+                    buffer.add(frame["response"])
+                if frame.get("done"):
+                    if stats is not None:
+                        stats.update(_done_stats(frame))
+                    break
+                if buffer.due():
+                    yield buffer.take()
+        finally:
+            reader.cancel()
 
     if buffer:
-        yield buffer
+        yield buffer.take()
 
 
 # -----------------------------
 # LLM generation (RAG)
 # -----------------------------
-def generate_completion(prompt: str, model: str = None, max_tokens: int = None,
-                        num_ctx: int = None, n8n_ready: bool = False) -> str:
-    model = model or cfg.LLM_MODEL
-    max_tokens = max_tokens or cfg.LLM_MAX_TOKENS
-
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "max_tokens": max_tokens,
-        "num_ctx": num_ctx or cfg.LLM_CTX,
-        "stream": False
-    }
-
-    res = _ollama_request("/api/generate", payload, timeout=120)
-
+def _completion_text(res: dict) -> str:
     if "choices" in res and len(res["choices"]) > 0:
         texts = []
         for choice in res["choices"]:
@@ -145,7 +355,10 @@ def generate_completion(prompt: str, model: str = None, max_tokens: int = None,
         full_text = "\n".join(map(str, res["output"])) if isinstance(res["output"], list) else str(res["output"])
     else:
         full_text = str(res)
+    return full_text
+
 
+def _parse_completion(full_text: str, n8n_ready: bool):
     if n8n_ready:
         summary, canonical = "", ""
         try:
@@ -168,3 +381,28 @@ def generate_completion(prompt: str, model: str = None, max_tokens: int = None,
         return GenerateResponse(summary=summary, canonical_embedding_text=canonical).dict()
 
     return full_text
+
+
+def _completion_key(payload: dict) -> str:
+    return completion_cache.key(payload["model"], payload["max_tokens"], payload["num_ctx"], payload["prompt"])
+
+
+async def agenerate_completion(prompt: str, model: str = None, max_tokens: int = None,
+                               num_ctx: int = None, n8n_ready: bool = False, cache: bool = True) -> str:
+    payload = _generate_payload(prompt, model, max_tokens, num_ctx, stream=False)
+    if not cache:
+        res = await _aollama_request("/api/generate", payload, timeout=120)
+        return _parse_completion(_completion_text(res), n8n_ready)
+    key = _completion_key(payload)
+    text = completion_cache.get(key)
+
+    vector = None
+    if text is None and completion_cache.semantic:
+        vector = await aembed_query(prompt)
+        text = completion_cache.semantic_get(key, vector)
+
+    if text is None:
+        res = await _aollama_request("/api/generate", payload, timeout=120)
+        text = _completion_text(res)
+        completion_cache.put(key, text, vector)
+    return _parse_completion(text, n8n_ready)
@@ -1,21 +1,34 @@
 
+import os
 import uuid
+import json
+import shutil
+import tarfile
+import zipfile
+import tempfile
 import hashlib
 import itertools
 import asyncio
-from typing import List, Optional, Dict, Any, Iterable
+from collections import deque
+from typing import (
+    List, Optional, Dict, Any, Iterable, Tuple, Deque, Union,
+    AsyncIterable, AsyncIterator, Iterator, NamedTuple, Callable, Awaitable
+)
 
 import feedparser
 from fastapi import UploadFile
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-from embeddings import embed_texts
+from embeddings import aembed_texts
+from sparse import document_vector, SparseVectorData
 from qdrant_store import QdrantStore
-from utils import parse_file_to_text
+from parsing import aiter_file_chunks, PARSE_WORKERS
+from db_source import astream_rows, build_select, jsonable
+from utils import log_template, parse_timestamp
 from schemas import (
     IngestRequest, LogIngestRequest, DBIngestRequest,
     RSSIngestRequest, RSSArticle, SocialIngestRequest,
-    IngestItem
+    IngestItem, CollectionOptions, DBQueryIngestRequest, LogEntry
 )
 import defaults as cfg
 
@@ -25,7 +38,18 @@ import defaults as cfg
 DEFAULT_CHUNK_SIZE = cfg.CHUNK_SIZE
 DEFAULT_CHUNK_OVERLAP = cfg.CHUNK_OVERLAP
 EMBED_BATCH_SIZE = cfg.EMBED_BATCH_SIZE
+EMBED_CONCURRENCY = cfg.EMBED_CONCURRENCY
 LOG_LINES_PER_CHUNK = cfg.LOG_LINES_PER_CHUNK
+UPLOAD_SPOOL_DIR = cfg.UPLOAD_SPOOL_DIR or None
+SPOOL_BLOCK_SIZE = 1024 * 1024
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+MAX_ARCHIVE_MEMBERS = cfg.MAX_ARCHIVE_MEMBERS
+MAX_ARCHIVE_BYTES = cfg.MAX_ARCHIVE_BYTES
+# Binary formats the parsers understand; any other member containing NUL bytes is skipped
+BINARY_DOCUMENT_SUFFIXES = (".pdf", ".docx")
+
+# (point id, chunk text, payload)
+IngestTuple = Tuple[str, str, Dict[str, Any]]
 
 # -----------------------------
 # Deterministic ID generation
@@ -54,16 +78,165 @@ def batch_iterable(iterable: Iterable, size: int) -> Iterable[List]:
         yield batch
 
 
-def _point_exists(store: QdrantStore, collection: str, point_id: str) -> bool:
+async def askip(items: Union[Iterable, AsyncIterable], n: int) -> AsyncIterator:
+    if not hasattr(items, "__aiter__"):
+        for item in itertools.islice(items, n, None):
+            yield item
+        return
+
+    seen = 0
+    async for item in items:
+        if seen >= n:
+            yield item
+        seen += 1
+
+
+async def abatch_iterable(items: Union[Iterable, AsyncIterable], size: int) -> AsyncIterator[List]:
+    if not hasattr(items, "__aiter__"):
+        for batch in batch_iterable(items, size):
+            yield batch
+        return
+
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _collection_options(options: Optional[CollectionOptions]) -> Optional[Dict[str, Any]]:
+    return options.dict(exclude_none=True) if options else None
+
+
+# Payload fields the server fills with now() when the client omits them: hashing
+# them would make every re-sent article or post look changed
+_UNHASHED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "rss": ("published_at",),
+    "social": ("timestamp",),
+}
+
+
+def content_hash(text: str, metadata: Optional[Dict[str, Any]] = None, exclude: Iterable[str] = ()) -> str:
+    # Covers the payload too, so metadata-only edits are still written
+    h = hashlib.sha256(text.encode("utf-8"))
+    if metadata:
+        hashed = {k: v for k, v in metadata.items() if k not in exclude}
+        h.update(json.dumps(hashed, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+# -----------------------------
+# Embed & upsert pipeline
+# -----------------------------
+# Shared by every ingest in this worker, so concurrent requests together
+# never keep more than EMBED_CONCURRENCY batches in flight against Ollama.
+_embed_semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+
+async def _embed_batch(texts: List[str]) -> List[List[float]]:
+    async with _embed_semaphore:
+        return await aembed_texts(texts)
+
+
+class _PreparedBatch(NamedTuple):
+    ids: List[str]
+    metadatas: List[Dict[str, Any]]
+    vectors: List[List[float]]
+    sparse_vectors: Optional[List[SparseVectorData]]
+    skipped: int
+
+
+async def _prepare_batch(store: QdrantStore, collection: str,
+                         batch: List[Tuple[str, str, Dict[str, Any]]],
+                         source_type: Optional[str] = None) -> _PreparedBatch:
+    unhashed = _UNHASHED_FIELDS.get(source_type, ())
+    for _, text, md in batch:
+        md.pop("content_hash", None)
+        md["content_hash"] = content_hash(text, md, exclude=unhashed)
+
+    # One retrieve per batch: drop chunks whose id and content hash are already stored
+    stored = await store.aexisting_content_hashes(collection, [b[0] for b in batch])
+    kept = [b for b in batch if stored.get(str(b[0])) != b[2]["content_hash"]]
+    skipped = len(batch) - len(kept)
+    if not kept:
+        return _PreparedBatch([], [], [], None, skipped)
+
+    texts = [b[1] for b in kept]
+    sparse_vectors = [document_vector(t) for t in texts] if cfg.SPARSE_VECTORS_ENABLED else None
+    vectors = await _embed_batch(texts)
+    return _PreparedBatch([b[0] for b in kept], [b[2] for b in kept], vectors, sparse_vectors, skipped)
+
+
+class Checkpoint(NamedTuple):
+    # Progress of a resumable job: the first `consumed` items were handled by an
+    # earlier run and are skipped; `save` is awaited after every upserted batch.
+    consumed: int
+    count: int
+    skipped: int
+    save: Callable[[int, int, int], Awaitable[None]]
+
+
+async def embed_and_upsert(store: QdrantStore, collection: str,
+                           items: Union[Iterable[IngestTuple], AsyncIterable[IngestTuple]],
+                           batch_size: int = EMBED_BATCH_SIZE, source_type: Optional[str] = None,
+                           collection_options: Optional[Dict[str, Any]] = None,
+                           checkpoint: Optional[Checkpoint] = None) -> Tuple[int, int]:
+    pending: Deque[asyncio.Task] = deque()
+    upsert_task: Optional[asyncio.Task] = None
+    consumed, total, skipped = 0, 0, 0
+
+    if checkpoint is not None:
+        consumed, total, skipped = checkpoint.consumed, checkpoint.count, checkpoint.skipped
+        if consumed:
+            items = askip(items, consumed)
+
+    async def upsert(prepared: _PreparedBatch):
+        nonlocal consumed, total, skipped
+        if prepared.ids:
+            await store.aupsert(
+                collection, prepared.ids, prepared.vectors, prepared.metadatas, prepared.sparse_vectors,
+                source_type=source_type, collection_options=collection_options
+            )
+        consumed += len(prepared.ids) + prepared.skipped
+        total += len(prepared.ids)
+        skipped += prepared.skipped
+        if checkpoint is not None:
+            await checkpoint.save(consumed, total, skipped)
+
+    async def flush_oldest():
+        nonlocal upsert_task
+        prepared = await pending.popleft()
+        # Upserts stay in batch order; the next one starts while later batches embed
+        if upsert_task is not None:
+            await upsert_task
+        upsert_task = asyncio.create_task(upsert(prepared))
+
     try:
-        return store.point_exists(collection, point_id)
-    except Exception:
-        return False
+        async for batch in abatch_iterable(items, batch_size):
+            pending.append(asyncio.create_task(_prepare_batch(store, collection, batch, source_type)))
+            if len(pending) >= EMBED_CONCURRENCY:
+                await flush_oldest()
+
+        while pending:
+            await flush_oldest()
+        if upsert_task is not None:
+            await upsert_task
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        if upsert_task is not None:
+            upsert_task.cancel()
+        raise
+
+    return total, skipped
 
 # -----------------------------
 # Generic text ingestion
 # -----------------------------
-async def ingest_texts(request: IngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE):
+async def ingest_texts(request: IngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE,
+                       checkpoint: Optional[Checkpoint] = None):
     collection = request.collection or cfg.DEFAULT_COLLECTION
     texts, metadatas, ids = [], [], []
 
@@ -83,52 +256,278 @@ async def ingest_texts(request: IngestRequest, store: QdrantStore, batch_size: i
             metadatas.append(md)
             ids.append(pt_id)
 
-    total = 0
-    for batch_ids, batch_metadatas, batch_texts in zip(
-        batch_iterable(ids, batch_size),
-        batch_iterable(metadatas, batch_size),
-        batch_iterable(texts, batch_size)
-    ):
-        vectors = await asyncio.to_thread(embed_texts, batch_texts)
-        await asyncio.to_thread(store.upsert, collection, batch_ids, vectors, batch_metadatas)
-        total += len(batch_ids)
+    total, skipped = await embed_and_upsert(
+        store, collection, zip(ids, texts, metadatas), batch_size,
+        collection_options=_collection_options(request.collection_options), checkpoint=checkpoint
+    )
 
-    return {"ok": True, "collection": collection, "count": total}
+    return {"ok": True, "collection": collection, "count": total, "skipped": skipped}
 
 # -----------------------------
 # File ingestion (async)
 # -----------------------------
+async def _spool_upload(file: UploadFile, directory: Optional[str] = None) -> str:
+    suffix = os.path.splitext(file.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory or UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await file.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                out.write(block)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def _file_items(path: str, filename: str, chunk_size: Optional[int],
+                      chunk_overlap: Optional[int]) -> AsyncIterator[IngestTuple]:
+    cs = chunk_size or DEFAULT_CHUNK_SIZE
+    co = chunk_overlap or DEFAULT_CHUNK_OVERLAP
+    i = 0
+    async for c in aiter_file_chunks(path, filename, cs, co):
+        yield (deterministic_id(filename, str(i)), c,
+               {"source": filename, "chunk_index": i, "source_type": "file", "snippet": c[:1000]})
+        i += 1
+
+
 async def ingest_file(file: UploadFile, collection: Optional[str], store: QdrantStore,
-                      chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
-    data = await file.read()
-    text = parse_file_to_text(data, file.filename)
-    chunks = chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+                      chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None,
+                      collection_options: Optional[CollectionOptions] = None):
+    coll = collection or cfg.DEFAULT_COLLECTION
+    path = await _spool_upload(file)
+
+    try:
+        total, skipped = await embed_and_upsert(
+            store, coll, _file_items(path, file.filename, chunk_size, chunk_overlap),
+            EMBED_BATCH_SIZE, source_type="file",
+            collection_options=_collection_options(collection_options)
+        )
+    finally:
+        os.unlink(path)
+
+    return {"ok": True, "collection": coll, "count": total, "skipped": skipped}
 
+# -----------------------------
+# Bulk file / archive ingestion
+# -----------------------------
+def _is_archive(filename: Optional[str]) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class ArchiveTooLargeError(ValueError):
+    pass
+
+
+def _extract_archive(path: str, filename: str,
+                     directory: str) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    # Members are copied to flat temp files, so archive paths never reach the filesystem.
+    # Returns (extracted (path, name) pairs, skipped (name, reason) pairs).
+    docs, skipped = [], []
+    budget = MAX_ARCHIVE_BYTES
+
+    def copy(src, member: str, size: int):
+        nonlocal budget
+        name = f"{filename}/{member}"
+        if size > budget:
+            skipped.append((name, f"Exceeds the archive size limit of {MAX_ARCHIVE_BYTES} bytes"))
+            return
+        head = src.read(8192)
+        if b"\0" in head and not member.lower().endswith(BINARY_DOCUMENT_SUFFIXES):
+            skipped.append((name, "Binary file"))
+            return
+        budget -= size
+        fd, out_path = tempfile.mkstemp(suffix=os.path.splitext(member)[1], dir=directory)
+        with os.fdopen(fd, "wb") as out:
+            out.write(head)
+            shutil.copyfileobj(src, out, SPOOL_BLOCK_SIZE)
+        docs.append((out_path, name))
+
+    def check_count(n: int):
+        if n > MAX_ARCHIVE_MEMBERS:
+            raise ArchiveTooLargeError(f"Archive has more than {MAX_ARCHIVE_MEMBERS} files")
+
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as zf:
+            members = [info for info in zf.infolist() if not info.is_dir()]
+            check_count(len(members))
+            for info in members:
+                # ZipExtFile stops at file_size, so the declared size bounds what is written
+                with zf.open(info) as src:
+                    copy(src, info.filename, info.file_size)
+    else:
+        with tarfile.open(path) as tf:
+            count = 0
+            for member in tf:
+                if member.isfile():
+                    count += 1
+                    check_count(count)
+                    with tf.extractfile(member) as src:
+                        copy(src, member.name, member.size)
+    return docs, skipped
+
+
+async def _multi_file_items(docs: List[Tuple[str, str, Dict[str, Any]]], chunk_size: Optional[int],
+                            chunk_overlap: Optional[int]) -> AsyncIterator[IngestTuple]:
+    # Files are parsed concurrently and their chunks merged into one stream,
+    # so embedding batches fill up across file boundaries
+    queue: asyncio.Queue = asyncio.Queue(maxsize=EMBED_BATCH_SIZE * 2)
+    slots = asyncio.Semaphore(PARSE_WORKERS)
+    done = object()
+
+    async def produce(path: str, filename: str, result: Dict[str, Any]):
+        async with slots:
+            try:
+                async for item in _file_items(path, filename, chunk_size, chunk_overlap):
+                    await queue.put(item)
+                    result["chunks"] += 1
+            except Exception as e:
+                result.update(ok=False, error=str(e))
+
+    async def produce_all():
+        await asyncio.gather(*(produce(*doc) for doc in docs))
+        await queue.put(done)
+
+    producer = asyncio.create_task(produce_all())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+        await producer
+    finally:
+        producer.cancel()
+
+
+async def ingest_files(files: List[UploadFile], collection: Optional[str], store: QdrantStore,
+                       chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None,
+                       collection_options: Optional[CollectionOptions] = None):
     coll = collection or cfg.DEFAULT_COLLECTION
-    ids = [deterministic_id(file.filename, str(i)) for i in range(len(chunks))]
-    metadatas = [{"source": file.filename, "chunk_index": i, "source_type": "file", "snippet": chunks[i][:1000]}
-                 for i in range(len(chunks))]
-
-    total = 0
-    for id_batch, md_batch, txt_batch in zip(
-        batch_iterable(ids, EMBED_BATCH_SIZE),
-        batch_iterable(metadatas, EMBED_BATCH_SIZE),
-        batch_iterable(chunks, EMBED_BATCH_SIZE)
-    ):
-        vecs = await asyncio.to_thread(embed_texts, txt_batch)
-        await asyncio.to_thread(store.upsert, coll, id_batch, vecs, md_batch)
-        total += len(id_batch)
-
-    return {"ok": True, "collection": coll, "count": total}
+    workdir = tempfile.mkdtemp(dir=UPLOAD_SPOOL_DIR)
+    results: List[Dict[str, Any]] = []
+    docs: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    try:
+        for file in files:
+            path = await _spool_upload(file, workdir)
+            if not _is_archive(file.filename):
+                members = [(path, file.filename)]
+            else:
+                try:
+                    members, rejected = await asyncio.to_thread(_extract_archive, path, file.filename, workdir)
+                except (zipfile.BadZipFile, tarfile.TarError) as e:
+                    results.append({"file": file.filename, "ok": False, "chunks": 0, "error": f"Invalid archive: {e}"})
+                    continue
+                except ArchiveTooLargeError as e:
+                    results.append({"file": file.filename, "ok": False, "chunks": 0, "error": str(e)})
+                    continue
+                finally:
+                    os.unlink(path)
+                results.extend({"file": name, "ok": False, "chunks": 0, "error": reason} for name, reason in rejected)
+
+            for member_path, name in members:
+                result = {"file": name, "ok": True, "chunks": 0}
+                results.append(result)
+                docs.append((member_path, name, result))
+
+        total, skipped = await embed_and_upsert(
+            store, coll, _multi_file_items(docs, chunk_size, chunk_overlap),
+            EMBED_BATCH_SIZE, source_type="file",
+            collection_options=_collection_options(collection_options)
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {"ok": True, "collection": coll, "count": total, "skipped": skipped, "files": results}
 
 # -----------------------------
 # Log ingestion
 # -----------------------------
-async def ingest_logs(request: LogIngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE):
-    collection = request.collection or cfg.DEFAULT_COLLECTION
-    texts, metadatas, ids = [], [], []
+def _log_groups(entries: Iterable[LogEntry], window_seconds: int) -> Iterator[List[LogEntry]]:
+    # Consecutive entries of one vm_id stay together until the window since the
+    # group's first entry is exceeded; other VMs' entries may be interleaved
+    open_groups: Dict[str, Tuple[Any, List[LogEntry]]] = {}
+    for entry in entries:
+        ts = parse_timestamp(entry.timestamp)
+        current = open_groups.get(entry.vm_id)
+        if current is not None:
+            start, group = current
+            if ts is not None and start is not None and abs((ts - start).total_seconds()) > window_seconds:
+                yield group
+                current = None
+        if current is None:
+            current = open_groups[entry.vm_id] = (ts, [])
+        current[1].append(entry)
+
+    for _, group in open_groups.values():
+        yield group
+
+
+def _collapse_log_lines(entries: List[LogEntry]) -> List[Tuple[str, List[str], str]]:
+    # Runs of lines sharing level and template become one line with a repeat count
+    runs: List[Tuple[LogEntry, Tuple[str, str], List[str]]] = []
+    for entry in entries:
+        key = (entry.log_level, log_template(entry.message))
+        if runs and runs[-1][1] == key:
+            runs[-1][2].append(entry.timestamp)
+        else:
+            runs.append((entry, key, [entry.timestamp]))
+
+    lines = []
+    for first, _, timestamps in runs:
+        line = f"[{first.timestamp}] [{first.vm_id}] [{first.log_level}] {first.message}"
+        if len(timestamps) > 1:
+            line += f" (repeated {len(timestamps)}x until {timestamps[-1]})"
+        lines.append((line, timestamps, first.log_level))
+    return lines
+
+
+def _split_log_lines(lines: List[Tuple[str, List[str], str]], lines_per_chunk: int,
+                     max_chars: int) -> Iterator[List[Tuple[str, List[str], str]]]:
+    # A chunk closes at lines_per_chunk lines or before it outgrows max_chars, so the
+    # embedder never truncates it; a single longer line still gets a chunk of its own
+    part, size = [], 0
+    for line in lines:
+        if part and (len(part) >= lines_per_chunk or size + 1 + len(line[0]) > max_chars):
+            yield part
+            part, size = [], 0
+        size += len(line[0]) + (1 if part else 0)
+        part.append(line)
+    if part:
+        yield part
+
+
+def _grouped_log_items(entries: Iterable[LogEntry], window_seconds: int,
+                       lines_per_chunk: int) -> Iterator[IngestTuple]:
+    for group in _log_groups(entries, window_seconds):
+        lines = _collapse_log_lines(group)
+        metadata: Dict[str, Any] = {}
+        for entry in group:
+            metadata.update(entry.metadata or {})
+
+        for i, part in enumerate(_split_log_lines(lines, lines_per_chunk, DEFAULT_CHUNK_SIZE)):
+            chunk = "\n".join(line for line, _, _ in part)
+            timestamps = [ts for _, line_ts, _ in part for ts in line_ts]
+            md = dict(metadata)
+            md.update({
+                "source_type": "log",
+                "vm_id": group[0].vm_id,
+                "timestamp": timestamps[0],
+                "end_timestamp": timestamps[-1],
+                "timestamps": timestamps,
+                "log_level": sorted({level for _, _, level in part if level}),
+                "line_count": len(timestamps),
+                "chunk_index": i,
+                "snippet": chunk[:1000]
+            })
+            yield deterministic_id(group[0].vm_id, group[0].id, str(i)), chunk, md
+
 
-    for entry in request.logs:
+def _log_line_items(entries: Iterable[LogEntry]) -> Iterator[IngestTuple]:
+    for entry in entries:
         text = f"[{entry.timestamp}] [{entry.vm_id}] [{entry.log_level}] {entry.message}"
         if not entry.id:
             entry.id = str(uuid.uuid4())
@@ -144,27 +543,36 @@ async def ingest_logs(request: LogIngestRequest, store: QdrantStore, batch_size:
                 "chunk_index": i,
                 "snippet": c[:1000]
             })
-            texts.append(c)
-            metadatas.append(md)
-            ids.append(pt_id)
+            yield pt_id, c, md
 
-    total = 0
-    for batch_ids, batch_mds, batch_texts in zip(
-        batch_iterable(ids, batch_size),
-        batch_iterable(metadatas, batch_size),
-        batch_iterable(texts, batch_size)
-    ):
-        vectors = await asyncio.to_thread(embed_texts, batch_texts)
-        await asyncio.to_thread(store.upsert, collection, batch_ids, vectors, batch_mds)
-        total += len(batch_ids)
 
-    return {"ok": True, "collection": collection, "count": total}
+async def ingest_logs(request: LogIngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE,
+                      checkpoint: Optional[Checkpoint] = None):
+    collection = request.collection or cfg.DEFAULT_COLLECTION
+    group = request.group if request.group is not None else cfg.LOG_GROUPING
+
+    if group:
+        items = _grouped_log_items(
+            request.logs,
+            request.window_seconds or cfg.LOG_GROUP_WINDOW_SECONDS,
+            request.lines_per_chunk or LOG_LINES_PER_CHUNK
+        )
+    else:
+        items = _log_line_items(request.logs)
+
+    total, skipped = await embed_and_upsert(
+        store, collection, items, batch_size, source_type="log",
+        collection_options=_collection_options(request.collection_options), checkpoint=checkpoint
+    )
+
+    return {"ok": True, "collection": collection, "count": total, "skipped": skipped}
 
 # -----------------------------
 # DB ingestion
 # -----------------------------
 async def ingest_db_rows(request: DBIngestRequest, db_config: Dict[str, Any], store: QdrantStore,
-                         batch_size: int = EMBED_BATCH_SIZE, text_columns: Optional[List[str]] = None):
+                         batch_size: int = EMBED_BATCH_SIZE, text_columns: Optional[List[str]] = None,
+                         checkpoint: Optional[Checkpoint] = None):
     collection = request.collection or cfg.DEFAULT_COLLECTION
     texts, metadatas, ids = [], [], []
 
@@ -185,22 +593,59 @@ async def ingest_db_rows(request: DBIngestRequest, db_config: Dict[str, Any], st
             metadatas.append(md)
             ids.append(pt_id)
 
-    total = 0
-    for id_batch, md_batch, txt_batch in zip(
-        batch_iterable(ids, batch_size),
-        batch_iterable(metadatas, batch_size),
-        batch_iterable(texts, batch_size)
-    ):
-        vecs = await asyncio.to_thread(embed_texts, txt_batch)
-        await asyncio.to_thread(store.upsert, collection, id_batch, vecs, md_batch)
-        total += len(id_batch)
+    total, skipped = await embed_and_upsert(
+        store, collection, zip(ids, texts, metadatas), batch_size, source_type="db",
+        collection_options=_collection_options(request.collection_options), checkpoint=checkpoint
+    )
 
-    return {"ok": True, "collection": collection, "count": total}
+    return {"ok": True, "collection": collection, "count": total, "skipped": skipped}
+
+async def ingest_db_query(request: DBQueryIngestRequest, db_config: Dict[str, Any], store: QdrantStore,
+                          batch_size: int = EMBED_BATCH_SIZE, checkpoint: Optional[Checkpoint] = None):
+    collection = request.collection or cfg.DEFAULT_COLLECTION
+    if request.watermark_column and not request.id_column:
+        # A row hash changes with the watermark, so updated rows would be stored twice
+        raise ValueError("'id_column' is required when 'watermark_column' is set.")
+    stmt, params = build_select(request.table, request.query, request.watermark_column, request.since)
+    source = request.table or f"query:{hashlib.sha256(request.query.encode('utf-8')).hexdigest()[:16]}"
+    state = {"rows": 0, "watermark": request.since}
+
+    async def items() -> AsyncIterator[IngestTuple]:
+        async for row in astream_rows(db_config, stmt, params, request.fetch_size):
+            row = {k: jsonable(v) for k, v in row.items()}
+            if request.id_column and request.id_column not in row:
+                raise ValueError(f"id_column '{request.id_column}' is not a column of the result.")
+            if request.id_column:
+                row_id = str(row[request.id_column])
+            else:
+                row_id = hashlib.sha256(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()
+            text = "\n".join(str(row.get(c, "")) for c in (request.text_columns or row.keys()))
+            for i, c in enumerate(chunk_text(text)):
+                md = {k: row.get(k) for k in (request.metadata_columns or [])}
+                md.update({"source_type": "db", "table": source, "row_id": row_id, "chunk_index": i, "snippet": c[:1000]})
+                if request.watermark_column:
+                    md[request.watermark_column] = row.get(request.watermark_column)
+                yield deterministic_id(source, row_id, str(i)), c, md
+
+            state["rows"] += 1
+            if request.watermark_column:
+                state["watermark"] = row.get(request.watermark_column)
+
+    total, skipped = await embed_and_upsert(
+        store, collection, items(), batch_size, source_type="db",
+        collection_options=_collection_options(request.collection_options), checkpoint=checkpoint
+    )
+
+    return {
+        "ok": True, "collection": collection, "count": total, "skipped": skipped,
+        "rows": state["rows"], "watermark": state["watermark"]
+    }
 
 # -----------------------------
 # RSS ingestion
 # -----------------------------
-async def ingest_rss(request: RSSIngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE):
+async def ingest_rss(request: RSSIngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE,
+                     checkpoint: Optional[Checkpoint] = None):
     collection = request.collection or cfg.DEFAULT_COLLECTION
     texts, metadatas, ids = [], [], []
 
@@ -221,28 +666,22 @@ async def ingest_rss(request: RSSIngestRequest, store: QdrantStore, batch_size:
                 "chunk_index": i,
                 "snippet": c[:1000]
             })
-            if _point_exists(store, collection, pt_id):
-                continue
             texts.append(c)
             metadatas.append(md)
             ids.append(pt_id)
 
-    total = 0
-    for id_batch, md_batch, txt_batch in zip(
-        batch_iterable(ids, batch_size),
-        batch_iterable(metadatas, batch_size),
-        batch_iterable(texts, batch_size)
-    ):
-        vecs = await asyncio.to_thread(embed_texts, txt_batch)
-        await asyncio.to_thread(store.upsert, collection, id_batch, vecs, md_batch)
-        total += len(id_batch)
+    total, skipped = await embed_and_upsert(
+        store, collection, zip(ids, texts, metadatas), batch_size, source_type="rss",
+        collection_options=_collection_options(request.collection_options), checkpoint=checkpoint
+    )
 
-    return {"ok": True, "collection": collection, "count": total}
+    return {"ok": True, "collection": collection, "count": total, "skipped": skipped}
 
 # -----------------------------
 # Social media ingestion
 # -----------------------------
-async def ingest_social(request: SocialIngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE):
+async def ingest_social(request: SocialIngestRequest, store: QdrantStore, batch_size: int = EMBED_BATCH_SIZE,
+                        checkpoint: Optional[Checkpoint] = None):
     collection = request.collection or cfg.DEFAULT_COLLECTION
     texts, metadatas, ids = [], [], []
 
@@ -262,28 +701,23 @@ async def ingest_social(request: SocialIngestRequest, store: QdrantStore, batch_
                 "chunk_index": i,
                 "snippet": c[:1000]
             })
-            if _point_exists(store, collection, pt_id):
-                continue
             texts.append(c)
             metadatas.append(md)
             ids.append(pt_id)
 
-    total = 0
-    for id_batch, md_batch, txt_batch in zip(
-        batch_iterable(ids, batch_size),
-        batch_iterable(metadatas, batch_size),
-        batch_iterable(texts, batch_size)
-    ):
-        vecs = await asyncio.to_thread(embed_texts, txt_batch)
-        await asyncio.to_thread(store.upsert, collection, id_batch, vecs, md_batch)
-        total += len(id_batch)
+    total, skipped = await embed_and_upsert(
+        store, collection, zip(ids, texts, metadatas), batch_size, source_type="social",
+        collection_options=_collection_options(request.collection_options), checkpoint=checkpoint
+    )
 
-    return {"ok": True, "collection": collection, "count": total}
+    return {"ok": True, "collection": collection, "count": total, "skipped": skipped}
 
 # -----------------------------
 # Fetch and ingest RSS feeds (async)
 # -----------------------------
-async def fetch_and_ingest_rss_feed(urls: List[str], collection: str, store: QdrantStore):
+async def fetch_and_ingest_rss_feed(urls: List[str], collection: str, store: QdrantStore,
+                                    collection_options: Optional[CollectionOptions] = None,
+                                    checkpoint: Optional[Checkpoint] = None):
     async def fetch_feed(url: str) -> List[RSSArticle]:
         feed = await asyncio.to_thread(feedparser.parse, url)
         articles = []
@@ -303,5 +737,9 @@ async def fetch_and_ingest_rss_feed(urls: List[str], collection: str, store: Qdr
     all_articles_lists = await asyncio.gather(*(fetch_feed(url) for url in urls))
     all_articles = [article for sublist in all_articles_lists for article in sublist]
 
-    request = RSSIngestRequest(collection=collection or cfg.DEFAULT_COLLECTION, articles=all_articles)
-    return await ingest_rss(request, store)
+    request = RSSIngestRequest(
+        collection=collection or cfg.DEFAULT_COLLECTION,
+        collection_options=collection_options,
+        articles=all_articles
+    )
+    return await ingest_rss(request, store, checkpoint=checkpoint)
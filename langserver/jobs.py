@@ -0,0 +1,323 @@
+"""
+jobs.py
+
+Background ingestion jobs:
+- Persistent queue in SQLite (JOBS_DB_PATH), shared by all workers
+- Submitting returns a job id; JOB_WORKERS tasks per process drain the queue
+- Progress is checkpointed after every upserted batch
+- Jobs left behind by a stopped or crashed worker resume from their checkpoint
+- Cancellation takes effect at the next heartbeat
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from ingest import (
+    Checkpoint, ingest_texts, ingest_logs, ingest_db_rows, ingest_db_query,
+    ingest_rss, ingest_social, fetch_and_ingest_rss_feed
+)
+from qdrant_store import QdrantStore
+from schemas import (
+    IngestRequest, LogIngestRequest, DBIngestRequest, DBQueryIngestRequest,
+    RSSIngestRequest, SocialIngestRequest, FetchRSSRequest
+)
+import defaults as cfg
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = {
+    "texts": IngestRequest,
+    "logs": LogIngestRequest,
+    "db": DBIngestRequest,
+    "db_query": DBQueryIngestRequest,
+    "rss": RSSIngestRequest,
+    "social": SocialIngestRequest,
+    "fetch_rss": FetchRSSRequest,
+}
+
+_COLUMNS = (
+    "id, kind, status, consumed, count, skipped, attempts, cancel_requested, "
+    "result, error, created_at, started_at, updated_at, finished_at"
+)
+
+
+class JobStore:
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    owner TEXT,
+                    consumed INTEGER NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    skipped INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._conn = conn
+        return self._conn
+
+    def open(self) -> None:
+        # Called at startup so a bad JOBS_DB_PATH fails there, not inside a worker task
+        with self._lock:
+            try:
+                self._db()
+            except (OSError, sqlite3.Error) as e:
+                raise RuntimeError(
+                    f"Cannot open job store at '{self.path}': {e}. Set JOBS_DB_PATH to a writable path "
+                    "or JOBS_ENABLED=false."
+                ) from e
+
+    @staticmethod
+    def _job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        if job.get("result"):
+            job["result"] = json.loads(job["result"])
+        if "payload" in job:
+            job["payload"] = json.loads(job["payload"])
+        return job
+
+    # -----------------------------
+    # Client side
+    # -----------------------------
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        model = JOB_KINDS.get(kind)
+        if model is None:
+            raise ValueError(f"Unknown job kind '{kind}'. Expected one of: {', '.join(JOB_KINDS)}")
+        # Item ids default to fresh uuids: storing the validated request pins them,
+        # so a resumed run produces the same point ids as the first one
+        request = model(**payload)
+
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(request.dict(), default=str), now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = f"SELECT {_COLUMNS} FROM jobs"
+        params: list = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db().execute(query, params).fetchall()
+        return [self._job(r) for r in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? WHERE id = ? AND status = 'queued'",
+                (now, now, job_id)
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    # -----------------------------
+    # Worker side
+    # -----------------------------
+    def claim(self, owner: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        # A running job whose heartbeat is older than the lease belongs to a dead worker
+        now = time.time()
+        stale = now - lease_seconds
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                    "WHERE status = 'running' AND updated_at < ? AND cancel_requested = 1",
+                    (now, stale)
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Exceeded max attempts' "
+                    "WHERE status = 'running' AND updated_at < ? AND attempts >= ?",
+                    (now, stale, self.max_attempts)
+                )
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (stale,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, attempts = attempts + 1, "
+                        "started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?",
+                        (owner, now, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self._job(row)
+
+    def heartbeat(self, job_id: str) -> bool:
+        # Returns True once cancellation was requested
+        with self._lock:
+            conn = self._db()
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def checkpoint(self, job_id: str, consumed: int, count: int, skipped: int) -> None:
+        with self._lock:
+            self._db().execute(
+                "UPDATE jobs SET consumed = ?, count = ?, skipped = ?, updated_at = ? WHERE id = ?",
+                (consumed, count, skipped, time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._db().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, now, now, job_id)
+            )
+
+    def release(self, owner: str) -> None:
+        # Hands this worker's unfinished jobs back to the queue on shutdown
+        with self._lock:
+            self._db().execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, attempts = attempts - 1 "
+                "WHERE status = 'running' AND owner = ? AND cancel_requested = 0",
+                (owner,)
+            )
+
+
+class JobRunner:
+
+    def __init__(self, jobs: JobStore, store: QdrantStore, db_config: Dict[str, Any],
+                 workers: int = 1, lease_seconds: float = 120.0, poll_interval: float = 1.0):
+        self.jobs = jobs
+        self.store = store
+        self.db_config = db_config
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.jobs.release, self.owner)
+
+    async def _worker(self):
+        failures = 0
+        while True:
+            try:
+                job = await asyncio.to_thread(self.jobs.claim, self.owner, self.lease_seconds)
+                if job is not None:
+                    await self._execute(job)
+                failures = 0
+            except Exception:
+                # Store errors must not kill the worker; an unfinished job is resumed after its lease
+                logger.exception("Ingestion job worker error")
+                failures += 1
+                job = None
+            if job is None:
+                await asyncio.sleep(min(self.poll_interval * 2 ** failures, 60.0))
+
+    async def _execute(self, job: Dict[str, Any]):
+        task = asyncio.create_task(self._run(job))
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.lease_seconds / 4)
+                if not task.done() and await asyncio.to_thread(self.jobs.heartbeat, job["id"]):
+                    task.cancel()
+        except asyncio.CancelledError:
+            # Worker shutdown: the job stays resumable from its last checkpoint
+            task.cancel()
+            raise
+
+        if task.cancelled():
+            status, result, error = "cancelled", None, None
+        elif task.exception() is not None:
+            logger.error("Ingestion job %s failed: %s", job["id"], task.exception())
+            status, result, error = "failed", None, str(task.exception())
+        else:
+            status, result, error = "done", task.result(), None
+        await asyncio.to_thread(self.jobs.finish, job["id"], status, result, error)
+
+    async def _run(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        kind = job["kind"]
+        request = JOB_KINDS[kind](**job["payload"])
+
+        async def save(consumed: int, count: int, skipped: int):
+            await asyncio.to_thread(self.jobs.checkpoint, job["id"], consumed, count, skipped)
+
+        # Feeds and queries are read again on resume, so item order is not stable:
+        # start over (content hashes still skip what the previous run already stored)
+        if kind == "fetch_rss":
+            return await fetch_and_ingest_rss_feed(
+                request.urls, request.collection, self.store, request.collection_options,
+                checkpoint=Checkpoint(0, 0, 0, save)
+            )
+        if kind == "db_query":
+            return await ingest_db_query(request, self.db_config, self.store, checkpoint=Checkpoint(0, 0, 0, save))
+
+        checkpoint = Checkpoint(job["consumed"], job["count"], job["skipped"], save)
+        if kind == "texts":
+            return await ingest_texts(request, self.store, checkpoint=checkpoint)
+        if kind == "logs":
+            return await ingest_logs(request, self.store, checkpoint=checkpoint)
+        if kind == "db":
+            return await ingest_db_rows(request, self.db_config, self.store, checkpoint=checkpoint)
+        if kind == "rss":
+            return await ingest_rss(request, self.store, checkpoint=checkpoint)
+        return await ingest_social(request, self.store, checkpoint=checkpoint)
+
+
+job_store = JobStore(cfg.JOBS_DB_PATH, max_attempts=cfg.JOB_MAX_ATTEMPTS)
@@ -1,9 +1,12 @@
 
+import json
+import heapq
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from fastapi import FastAPI, Depends, UploadFile, Form
+from fastapi import FastAPI, Depends, UploadFile, Form, Request, HTTPException
+from fastapi.responses import JSONResponse
 from typing import List, Optional
-import asyncio
 
 # -----------------------------
 # Import centralized defaults
@@ -35,32 +38,110 @@ for logger_name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
 from schemas import (
     IngestRequest, LogIngestRequest, DBIngestRequest,
     RSSIngestRequest, FetchRSSRequest, SocialIngestRequest, QueryRequest,
-    DeleteCollectionRequest, GenerateRequest, DebugChunkRequest,
+    DeleteCollectionRequest, PayloadIndexRequest, GenerateRequest, DebugChunkRequest,
     DebugEmbedRequest, DebugEmbedResponse, HybridQueryRequest,
-    MultiQueryRequest, ChatRequest, ChatResponse
+    MultiQueryRequest, ChatRequest, ChatResponse, CollectionOptions, JobSubmitRequest,
+    DBQueryIngestRequest, Quantization
 )
 from ingest import (
-    ingest_texts, ingest_file, ingest_logs, ingest_db_rows,
+    ingest_texts, ingest_file, ingest_files, ingest_logs, ingest_db_rows, ingest_db_query,
     ingest_rss, ingest_social, fetch_and_ingest_rss_feed,
     chunk_text
 )
-from qdrant_store import QdrantStore
-from embeddings import embed_query, generate_completion, stream_completion, embed_texts
+from qdrant_store import QdrantStore, CollectionNotFoundError, keyword_filter
+from embeddings import (
+    aembed_query, agenerate_completion, astream_completion, aembed_texts,
+    open_async_client, close_async_client,
+    query_flights, query_batcher
+)
+from embedding_cache import embedding_cache
+from query_cache import query_cache
+from completion_cache import completion_cache
+from sparse import query_vector
+from parsing import get_parse_pool, shutdown_parse_pool
+from jobs import JobRunner, job_store
+from db_source import close_db_pool
 from utils import require_api_key
 from sse_starlette.sse import EventSourceResponse
 
 # -----------------------------
 # FastAPI initialization
 # -----------------------------
-app = FastAPI(title="LangChain Multi-Source API")
+DB_CONFIG = {
+    "host": cfg.DB_HOST,
+    "port": cfg.DB_PORT,
+    "dbname": cfg.DB_NAME,
+    "user": cfg.DB_USER,
+    "password": cfg.DB_PASSWORD
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    open_async_client()
+    get_parse_pool()
+    query_cache.open()
+    runner = None
+    if cfg.JOBS_ENABLED:
+        job_store.open()
+        runner = JobRunner(job_store, store, DB_CONFIG, workers=cfg.JOB_WORKERS, lease_seconds=cfg.JOB_LEASE_SECONDS)
+        runner.start()
+    try:
+        yield
+    finally:
+        if runner is not None:
+            await runner.stop()
+        await close_async_client()
+        await store.aclose()
+        shutdown_parse_pool()
+        close_db_pool()
+
+
+app = FastAPI(title="LangChain Multi-Source API", lifespan=lifespan)
 store = QdrantStore()
 
+
+@app.exception_handler(CollectionNotFoundError)
+async def collection_not_found_handler(request: Request, exc: CollectionNotFoundError):
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+# -----------------------------
+# Multi-collection result merging
+# -----------------------------
+def _merge_top_k(result_lists: List[List[dict]], top_k: int) -> List[dict]:
+    return heapq.nlargest(top_k, (r for results in result_lists for r in results), key=lambda r: r["score"])
+
+# -----------------------------
+# RAG answers (blocking or streamed)
+# -----------------------------
+def _summary_prompt(snippets: List[str]) -> str:
+    context_text = "\n\n".join(snippets)
+    return (
+        f"Here are some factual snippets from the knowledge base:\n\n{context_text}\n\n"
+        "Please provide a concise summary or highlight key points without adding new information."
+    )
+
+
+def _stream_rag(retrieval: dict, prompt: Optional[str], model: Optional[str]) -> EventSourceResponse:
+    # Retrieval results go out as soon as they exist; the answer follows token by token
+    async def event_generator():
+        yield {"event": "results", "data": json.dumps(retrieval, default=str)}
+        stats = {}
+        if prompt:
+            async for chunk in astream_completion(prompt, model=model, stats=stats):
+                yield {"data": chunk}
+        if stats:
+            yield {"event": "stats", "data": json.dumps(stats)}
+        yield {"data": "[DONE]"}
+
+    return EventSourceResponse(event_generator())
+
 # -----------------------------
 # Endpoint: LLM Generation
 # -----------------------------
 @app.post("/generate")
-def api_generate(req: GenerateRequest, auth: bool = Depends(require_api_key)):
-    response = generate_completion(
+async def api_generate(req: GenerateRequest, auth: bool = Depends(require_api_key)):
+    response = await agenerate_completion(
         prompt=req.prompt,
         model=req.model or cfg.LLM_MODEL,
         max_tokens=req.max_tokens or cfg.LLM_MAX_TOKENS,
@@ -74,7 +155,7 @@ def api_generate(req: GenerateRequest, auth: bool = Depends(require_api_key)):
 # Endpoint: CHAT
 # -----------------------------
 @app.post("/chat")
-def api_chat(req: ChatRequest, auth: bool = Depends(require_api_key)):
+async def api_chat(req: ChatRequest, auth: bool = Depends(require_api_key)):
 
     conversation = []
     for msg in req.messages:
@@ -86,21 +167,27 @@ def api_chat(req: ChatRequest, auth: bool = Depends(require_api_key)):
 
     if use_stream:
         async def event_generator():
-            for chunk in stream_completion(
+            stats = {}
+            async for chunk in astream_completion(
                 prompt,
                 model=req.model or cfg.LLM_MODEL,
-                max_tokens=req.max_tokens or cfg.LLM_MAX_TOKENS
+                max_tokens=req.max_tokens or cfg.LLM_MAX_TOKENS,
+                stats=stats
             ):
                 yield {"data": chunk}
 
+            if stats:
+                yield {"event": "stats", "data": json.dumps(stats)}
             yield {"data": "[DONE]"}
 
         return EventSourceResponse(event_generator())
 
-    reply = generate_completion(
+    # Conversations are not cached: a repeated or similar chat should get a fresh reply
+    reply = await agenerate_completion(
         prompt=prompt,
         model=req.model or cfg.LLM_MODEL,
-        max_tokens=req.max_tokens or cfg.LLM_MAX_TOKENS
+        max_tokens=req.max_tokens or cfg.LLM_MAX_TOKENS,
+        cache=False
     )
     return ChatResponse(response=reply)
 
@@ -118,9 +205,31 @@ async def api_ingest_texts(request: IngestRequest, auth: bool = Depends(require_
 async def api_ingest_file(
     file: UploadFile,
     collection: Optional[str] = Form(None),
+    quantization: Optional[Quantization] = Form(None),
+    on_disk: Optional[bool] = Form(None),
+    auth: bool = Depends(require_api_key)
+):
+    options = CollectionOptions(quantization=quantization, on_disk=on_disk)
+    return await ingest_file(file, collection or cfg.DEFAULT_COLLECTION, store, collection_options=options)
+
+# -----------------------------
+# Endpoint: Bulk File / Archive Ingestion
+# -----------------------------
+@app.post("/ingest_files")
+async def api_ingest_files(
+    files: List[UploadFile],
+    collection: Optional[str] = Form(None),
+    chunk_size: Optional[int] = Form(None),
+    chunk_overlap: Optional[int] = Form(None),
+    quantization: Optional[Quantization] = Form(None),
+    on_disk: Optional[bool] = Form(None),
     auth: bool = Depends(require_api_key)
 ):
-    return await ingest_file(file, collection or cfg.DEFAULT_COLLECTION, store)
+    options = CollectionOptions(quantization=quantization, on_disk=on_disk)
+    return await ingest_files(
+        files, collection or cfg.DEFAULT_COLLECTION, store,
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, collection_options=options
+    )
 
 # -----------------------------
 # Endpoint: Log Ingestion
@@ -134,14 +243,15 @@ async def api_ingest_logs(request: LogIngestRequest, auth: bool = Depends(requir
 # -----------------------------
 @app.post("/ingest_db")
 async def api_ingest_db(request: DBIngestRequest, auth: bool = Depends(require_api_key)):
-    db_config = {
-        "host": cfg.DB_HOST,
-        "port": cfg.DB_PORT,
-        "dbname": cfg.DB_NAME,
-        "user": cfg.DB_USER,
-        "password": cfg.DB_PASSWORD
-    }
-    return await ingest_db_rows(request, db_config, store)
+    return await ingest_db_rows(request, DB_CONFIG, store)
+
+
+@app.post("/ingest_db_query")
+async def api_ingest_db_query(request: DBQueryIngestRequest, auth: bool = Depends(require_api_key)):
+    try:
+        return await ingest_db_query(request, DB_CONFIG, store)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # -----------------------------
 # Endpoint: RSS Ingestion
@@ -165,32 +275,86 @@ async def api_fetch_rss_feeds(
     request: FetchRSSRequest,
     auth: bool = Depends(require_api_key)
 ):
-    return await fetch_and_ingest_rss_feed(request.urls, request.collection, store)
+    return await fetch_and_ingest_rss_feed(request.urls, request.collection, store, request.collection_options)
+
+
+# -----------------------------
+# Endpoints: Background ingestion jobs
+# -----------------------------
+def require_jobs_enabled() -> bool:
+    # Without runners a submitted job would stay queued forever
+    if not cfg.JOBS_ENABLED:
+        raise HTTPException(status_code=503, detail="Background jobs are disabled (JOBS_ENABLED=false)")
+    return True
+
+
+@app.post("/jobs")
+def api_submit_job(req: JobSubmitRequest, auth: bool = Depends(require_api_key),
+                   enabled: bool = Depends(require_jobs_enabled)):
+    try:
+        return job_store.submit(req.kind, req.payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/jobs")
+def api_list_jobs(status: Optional[str] = None, limit: int = 50, auth: bool = Depends(require_api_key),
+                  enabled: bool = Depends(require_jobs_enabled)):
+    return {"jobs": job_store.list(status, limit)}
+
+
+@app.get("/jobs/{job_id}")
+def api_get_job(job_id: str, auth: bool = Depends(require_api_key), enabled: bool = Depends(require_jobs_enabled)):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+def api_cancel_job(job_id: str, auth: bool = Depends(require_api_key),
+                   enabled: bool = Depends(require_jobs_enabled)):
+    job = job_store.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
 
 
 # -----------------------------
 # Endpoint: Semantic Query
 # -----------------------------
 @app.post("/query")
-def api_query(req: QueryRequest, auth: bool = Depends(require_api_key)):
-    vec = embed_query(req.query, req.embed_model or cfg.EMBED_MODEL)
-    
-    results = store.search_by_vector(
-        vec,
-        req.collection or cfg.DEFAULT_COLLECTION,
-        top_k=req.top_k or cfg.QUERY_TOP_K,
-        filter=req.filters
+async def api_query(req: QueryRequest, auth: bool = Depends(require_api_key)):
+    collection = req.collection or cfg.DEFAULT_COLLECTION
+    top_k = req.top_k or cfg.QUERY_TOP_K
+    embed_model = req.embed_model or cfg.EMBED_MODEL
+
+    async def search():
+        vec = await aembed_query(req.query, embed_model)
+        return await store.asearch_by_vector(
+            vec,
+            collection,
+            top_k=top_k,
+            filter=req.filters,
+            oversampling=req.oversampling,
+            rescore=req.rescore
+        )
+
+    cache_key = query_cache.key(
+        "query", req.query, [collection], filters=req.filters, top_k=top_k, embed_model=embed_model,
+        oversampling=req.oversampling, rescore=req.rescore
     )
+    results = await query_cache.get_or_search(cache_key, [collection], search)
 
+    prompt = None
     if req.llm_model and results:
-        context_snippets = [r["payload"].get("snippet", "") for r in results if r["payload"].get("snippet")]
-        context_text = "\n\n".join(context_snippets)
+        prompt = _summary_prompt([r["payload"].get("snippet", "") for r in results if r["payload"].get("snippet")])
 
-        enriched = generate_completion(
-            f"Here are some factual snippets from the knowledge base:\n\n{context_text}\n\n"
-            "Please provide a concise summary or highlight key points without adding new information.",
-            model=req.llm_model
-        )
+    if req.stream:
+        return _stream_rag({"results": results}, prompt, req.llm_model)
+
+    if prompt:
+        enriched = await agenerate_completion(prompt, model=req.llm_model)
         return {"enriched": enriched, "results": results}
 
     return {"results": results}
@@ -201,32 +365,31 @@ def api_query(req: QueryRequest, auth: bool = Depends(require_api_key)):
 # Endpoint: Semantic Query-Hybrid
 # -----------------------------
 @app.post("/query_hybrid")
-def api_query_hybrid(req: HybridQueryRequest, auth: bool = Depends(require_api_key)):
+async def api_query_hybrid(req: HybridQueryRequest, auth: bool = Depends(require_api_key)):
     collections = req.collections or [cfg.DEFAULT_COLLECTION]
-    vec = embed_query(req.query, req.embed_model or cfg.EMBED_MODEL)
+    top_k = req.top_k or cfg.QUERY_TOP_K
+    embed_model = req.embed_model or cfg.EMBED_MODEL
 
-    all_results = []
-    for coll in collections:
-        results = store.search_by_vector(
+    async def search():
+        vec = await aembed_query(req.query, embed_model)
+        return await store.asearch_collections(
             vec,
-            collection=coll,
-            top_k=req.top_k or cfg.QUERY_TOP_K,
-            filter=None
+            collections,
+            top_k=top_k,
+            filter=keyword_filter(req.keyword_filters),
+            sparse=query_vector(req.query),
+            oversampling=req.oversampling,
+            rescore=req.rescore
         )
 
-        if req.keyword_filters:
-            filtered = []
-            for r in results:
-                payload = r.get("payload", {})
-                match = True
-                for key, val in req.keyword_filters.items():
-                    if key not in payload or val.lower() not in str(payload[key]).lower():
-                        match = False
-                        break
-                if match:
-                    filtered.append(r)
-            results = filtered
+    cache_key = query_cache.key(
+        "hybrid", req.query, collections, keyword_filters=req.keyword_filters, top_k=top_k,
+        embed_model=embed_model, oversampling=req.oversampling, rescore=req.rescore
+    )
+    # Copied: the recency boost below sorts in place
+    per_collection = [list(r) for r in await query_cache.get_or_search(cache_key, collections, search)]
 
+    for results in per_collection:
         if req.boost_recent_days:
             cutoff = datetime.utcnow() - timedelta(days=req.boost_recent_days)
 
@@ -242,65 +405,67 @@ def api_query_hybrid(req: HybridQueryRequest, auth: bool = Depends(require_api_k
 
             results.sort(key=recent_score, reverse=True)
 
-        all_results.extend(results)
+    all_results = _merge_top_k(per_collection, top_k)
 
-    all_results = sorted(all_results, key=lambda x: x["score"], reverse=True)[: req.top_k or cfg.QUERY_TOP_K]
-
-    enriched = None
-    if req.llm_model and all_results:
-        context_snippets = [r["payload"].get("snippet", "") for r in all_results]
-        context_text = "\n\n".join(context_snippets)
-
-        enriched = generate_completion(
-            f"Here are some factual snippets from the knowledge base:\n\n{context_text}\n\n"
-            "Please provide a concise summary or highlight key points without adding new information.",
-            model=req.llm_model
-        )
-
-    return {
+    retrieval = {
         "query": req.query,
         "collections": collections,
-        "results": all_results if req.return_raw else [r["payload"] for r in all_results],
-        "enriched": enriched
+        "results": all_results if req.return_raw else [r["payload"] for r in all_results]
     }
+    prompt = None
+    if req.llm_model and all_results:
+        prompt = _summary_prompt([r["payload"].get("snippet", "") for r in all_results])
+
+    if req.stream:
+        return _stream_rag(retrieval, prompt, req.llm_model)
+
+    enriched = None
+    if prompt:
+        enriched = await agenerate_completion(prompt, model=req.llm_model)
+
+    return {**retrieval, "enriched": enriched}
 
 # -----------------------------
 # Endpoint: Semantic Query-Multi-Collections
 # -----------------------------
 @app.post("/query_multi")
-def api_query_multi(req: MultiQueryRequest, auth: bool = Depends(require_api_key)):
-    vec = embed_query(req.query, req.embed_model or cfg.EMBED_MODEL)
-    all_results = []
+async def api_query_multi(req: MultiQueryRequest, auth: bool = Depends(require_api_key)):
+    collections = req.collections or [cfg.DEFAULT_COLLECTION]
+    top_k = req.top_k or cfg.QUERY_TOP_K
+    embed_model = req.embed_model or cfg.EMBED_MODEL
 
-    for collection in req.collections or [cfg.DEFAULT_COLLECTION]:
-        results = store.search_by_vector(
+    async def search():
+        vec = await aembed_query(req.query, embed_model)
+        return await store.asearch_collections(
             vec,
-            collection,
-            top_k=req.top_k or cfg.QUERY_TOP_K,
-            filter=req.filters
+            collections,
+            top_k=top_k,
+            filter=req.filters,
+            sparse=query_vector(" ".join(req.hybrid_keywords)) if req.hybrid_keywords else None,
+            oversampling=req.oversampling,
+            rescore=req.rescore
         )
-        for r in results:
-            r["collection"] = collection
-        all_results.extend(results)
 
-    all_results.sort(key=lambda x: x["score"], reverse=True)
-    all_results = all_results[: req.top_k or cfg.QUERY_TOP_K]
+    cache_key = query_cache.key(
+        "multi", req.query, collections, filters=req.filters, hybrid_keywords=req.hybrid_keywords,
+        top_k=top_k, embed_model=embed_model, oversampling=req.oversampling, rescore=req.rescore
+    )
+    per_collection = await query_cache.get_or_search(cache_key, collections, search)
+    all_results = _merge_top_k(per_collection, top_k)
 
-    answer = None
+    retrieval = {"results": all_results if req.return_raw else [r["payload"] for r in all_results]}
+    prompt = None
     if req.llm_model and all_results:
-        context_snippets = [r["payload"].get("snippet", "") for r in all_results]
-        context_text = "\n\n".join(context_snippets)
+        prompt = _summary_prompt([r["payload"].get("snippet", "") for r in all_results])
 
-        answer = generate_completion(
-            f"Here are some factual snippets from the knowledge base:\n\n{context_text}\n\n"
-            "Please provide a concise summary or highlight key points without adding new information.",
-            model=req.llm_model
-        )
+    if req.stream:
+        return _stream_rag(retrieval, prompt, req.llm_model)
 
-    return {
-        "results": all_results if req.return_raw else [r["payload"] for r in all_results],
-        "answer": answer
-    }
+    answer = None
+    if prompt:
+        answer = await agenerate_completion(prompt, model=req.llm_model)
+
+    return {**retrieval, "answer": answer}
 
 
 # -----------------------------
@@ -318,6 +483,33 @@ def api_delete_collection(req: DeleteCollectionRequest, auth: bool = Depends(req
     store.delete_collection(req.collection)
     return {"ok": True, "deleted": req.collection}
 
+# -----------------------------
+# Endpoint: Apply Payload Indexes
+# -----------------------------
+@app.post("/collections/indexes")
+async def api_apply_payload_indexes(req: PayloadIndexRequest, auth: bool = Depends(require_api_key)):
+    try:
+        fields = await store.aapply_payload_indexes(req.collection, req.source_types, req.text_index_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ok": True, "collection": req.collection, "indexed_fields": fields}
+
+# -----------------------------
+# Endpoint: Cache Statistics
+# -----------------------------
+@app.get("/cache/stats")
+def api_cache_stats(auth: bool = Depends(require_api_key)):
+    return {
+        "embeddings": embedding_cache.stats(),
+        "queries": query_cache.stats(),
+        "completions": completion_cache.stats(),
+        "coalescing": {
+            "query_embeddings": query_flights.stats(),
+            "query_embedding_batches": query_batcher.stats(),
+            "searches": store.search_flights.stats()
+        }
+    }
+
 # -----------------------------
 # Health Check Endpoint
 # -----------------------------
@@ -355,7 +547,7 @@ def debug_chunk(req: DebugChunkRequest):
 @app.post("/debug/embeds", response_model=DebugEmbedResponse)
 async def api_debug_embeds(req: DebugEmbedRequest, auth: bool = Depends(require_api_key)):
     try:
-        vectors = await asyncio.to_thread(embed_texts, req.texts, model=req.model or cfg.EMBED_MODEL)
+        vectors = await aembed_texts(req.texts, model=req.model or cfg.EMBED_MODEL)
         dims = len(vectors[0]) if vectors else None
 
         return DebugEmbedResponse(
@@ -0,0 +1,165 @@
+"""
+parsing.py
+
+Parses and chunks uploaded documents off the event loop:
+- Shared ProcessPoolExecutor sized by PARSE_WORKERS
+- PDFs split into page ranges that are parsed in parallel
+- Plain text split into newline-aligned byte ranges
+- Chunks yielded in document order with bounded look-ahead
+- A pool broken by a dying child (e.g. OOM-killed) is replaced; the file
+  being parsed is retried once on the new pool
+"""
+
+import os
+import asyncio
+import multiprocessing
+from collections import deque
+from contextlib import aclosing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Optional, AsyncIterator
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from utils import iter_file_text
+import defaults as cfg
+
+# Every uvicorn worker owns a pool: by default they split the CPUs between them
+PARSE_WORKERS = cfg.PARSE_WORKERS or max(1, (os.cpu_count() or 1) // cfg.WEB_CONCURRENCY)
+PDF_PAGES_PER_TASK = cfg.PDF_PAGES_PER_TASK
+TEXT_BYTES_PER_TASK = cfg.TEXT_BYTES_PER_TASK
+
+# -----------------------------
+# Process pool
+# -----------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a threaded server process can deadlock the children
+        _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    # The next get_parse_pool() builds a fresh pool
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+# -----------------------------
+# Worker tasks (run in the pool)
+# -----------------------------
+def _split(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_text(text)
+
+
+def _pdf_page_count(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def _chunk_pdf_pages(path: str, start: int, end: int, chunk_size: int, chunk_overlap: int) -> List[str]:
+    reader = PdfReader(path)
+    text = "\n\n".join(reader.pages[i].extract_text() or "" for i in range(start, end))
+    return _split(text, chunk_size, chunk_overlap)
+
+
+def _chunk_text_range(path: str, start: int, end: int, chunk_size: int, chunk_overlap: int) -> List[str]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return _split(data.decode("utf-8", errors="ignore"), chunk_size, chunk_overlap)
+
+
+def _chunk_document(path: str, filename: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    return _split("".join(iter_file_text(path, filename)), chunk_size, chunk_overlap)
+
+# -----------------------------
+# Task planning
+# -----------------------------
+def _text_ranges(path: str, size: int) -> List[Tuple[int, int]]:
+    # Each range ends on a newline, so no word or UTF-8 sequence is cut in two
+    total = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, "rb") as f:
+        while start < total:
+            end = min(start + size, total)
+            f.seek(end)
+            while end < total:
+                block = f.read(4096)
+                nl = block.find(b"\n")
+                if nl >= 0:
+                    end += nl + 1
+                    break
+                end += len(block)
+            ranges.append((start, min(end, total)))
+            start = end
+    return ranges
+
+
+async def aiter_file_chunks(path: str, filename: str, chunk_size: int,
+                            chunk_overlap: int) -> AsyncIterator[str]:
+    # A broken pool may have been caused by another file sharing it, so retry once.
+    # Parsing is deterministic: chunks already yielded are skipped on the retry.
+    yielded = 0
+    for attempt in range(2):
+        try:
+            async with aclosing(_aiter_chunks(path, filename, chunk_size, chunk_overlap)) as chunks:
+                i = 0
+                async for chunk in chunks:
+                    if i >= yielded:
+                        yield chunk
+                        yielded += 1
+                    i += 1
+            return
+        except BrokenProcessPool as e:
+            if attempt:
+                raise RuntimeError(f"Parser process died while parsing '{filename}'") from e
+
+
+async def _aiter_chunks(path: str, filename: str, chunk_size: int, chunk_overlap: int) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+    name = filename.lower()
+    try:
+        if name.endswith(".pdf"):
+            pages = await loop.run_in_executor(pool, _pdf_page_count, path)
+            tasks = [
+                (_chunk_pdf_pages, path, s, min(s + PDF_PAGES_PER_TASK, pages), chunk_size, chunk_overlap)
+                for s in range(0, pages, PDF_PAGES_PER_TASK)
+            ]
+        elif name.endswith((".docx", ".html", ".htm")):
+            tasks = [(_chunk_document, path, filename, chunk_size, chunk_overlap)]
+        else:
+            ranges = await asyncio.to_thread(_text_ranges, path, TEXT_BYTES_PER_TASK)
+            tasks = [(_chunk_text_range, path, s, e, chunk_size, chunk_overlap) for s, e in ranges]
+
+        pending: deque = deque()
+        try:
+            for fn, *args in tasks:
+                pending.append(loop.run_in_executor(pool, fn, *args))
+                if len(pending) >= PARSE_WORKERS:
+                    for chunk in await pending.popleft():
+                        yield chunk
+            while pending:
+                for chunk in await pending.popleft():
+                    yield chunk
+        finally:
+            for fut in pending:
+                fut.cancel()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
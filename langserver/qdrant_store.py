@@ -1,9 +1,16 @@
 
 import time
-from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient
+import json
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Set
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models as qm
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchText
+from sparse import SparseVectorData
+from query_cache import query_cache
+from coalesce import SingleFlight
 import defaults as cfg  # centralized configuration
 
 # -----------------------------
@@ -11,20 +18,120 @@ import defaults as cfg  # centralized configuration
 # -----------------------------
 QDRANT_URL = cfg.QDRANT_URL
 QDRANT_API_KEY = cfg.QDRANT_API_KEY
+QDRANT_PREFER_GRPC = cfg.QDRANT_PREFER_GRPC
+QDRANT_GRPC_PORT = cfg.QDRANT_GRPC_PORT
+QDRANT_TIMEOUT = cfg.QDRANT_TIMEOUT
 DEFAULT_VECTOR_SIZE = cfg.VECTOR_SIZE
 COLLECTION_CACHE_TTL = cfg.COLLECTION_CACHE_TTL
+PAYLOAD_TEXT_INDEX_FIELDS = cfg.PAYLOAD_TEXT_INDEX_FIELDS
+SPARSE_VECTORS_ENABLED = cfg.SPARSE_VECTORS_ENABLED
+SPARSE_VECTOR_NAME = cfg.SPARSE_VECTOR_NAME
+HYBRID_PREFETCH_FACTOR = cfg.HYBRID_PREFETCH_FACTOR
+COLLECTION_QUANTIZATION = cfg.COLLECTION_QUANTIZATION
+QUANTIZATION_ALWAYS_RAM = cfg.QUANTIZATION_ALWAYS_RAM
+VECTORS_ON_DISK = cfg.VECTORS_ON_DISK
+HNSW_M = cfg.HNSW_M
+HNSW_EF_CONSTRUCT = cfg.HNSW_EF_CONSTRUCT
+HNSW_ON_DISK = cfg.HNSW_ON_DISK
+SEARCH_HNSW_EF = cfg.SEARCH_HNSW_EF
+SEARCH_OVERSAMPLING = cfg.SEARCH_OVERSAMPLING
+SEARCH_RESCORE = cfg.SEARCH_RESCORE
+RETRIEVE_BATCH_SIZE = 1000
+
+TEXT_INDEX_SCHEMA = qm.TextIndexParams(
+    type=qm.TextIndexType.TEXT,
+    tokenizer=qm.TokenizerType.WORD,
+    min_token_len=2,
+    lowercase=True
+)
+
+# Payload indexes declared per source_type (matches the payloads built in ingest.py).
+# The "*" entry applies to every collection, alongside PAYLOAD_TEXT_INDEX_FIELDS.
+PAYLOAD_INDEXES: Dict[str, Dict[str, Any]] = {
+    "*": {
+        "source_type": qm.PayloadSchemaType.KEYWORD,
+    },
+    "log": {
+        "vm_id": qm.PayloadSchemaType.KEYWORD,
+        "log_level": qm.PayloadSchemaType.KEYWORD,
+        "timestamp": qm.PayloadSchemaType.DATETIME,
+        "end_timestamp": qm.PayloadSchemaType.DATETIME,
+    },
+    "rss": {
+        "url": qm.PayloadSchemaType.KEYWORD,
+        "published_at": qm.PayloadSchemaType.DATETIME,
+    },
+    "social": {
+        "platform": qm.PayloadSchemaType.KEYWORD,
+        "user_id": qm.PayloadSchemaType.KEYWORD,
+        "timestamp": qm.PayloadSchemaType.DATETIME,
+    },
+    "db": {
+        "table": qm.PayloadSchemaType.KEYWORD,
+    },
+    "file": {
+        "source": qm.PayloadSchemaType.KEYWORD,
+    },
+}
+
+
+class CollectionNotFoundError(LookupError):
+
+    def __init__(self, collection: str):
+        super().__init__(f"Collection '{collection}' not found")
+        self.collection = collection
+
+
+def _is_not_found(e: Exception) -> bool:
+    if isinstance(e, UnexpectedResponse) and e.status_code == 404:
+        return True
+    code = getattr(e, "code", None)
+    if callable(code):  # grpc.RpcError
+        try:
+            return getattr(code(), "name", "") == "NOT_FOUND"
+        except Exception:
+            return False
+    msg = str(e).lower()
+    return "collection" in msg and ("not found" in msg or "doesn't exist" in msg)
+
+
+def keyword_filter(keywords: Dict[str, str]) -> Optional[Filter]:
+    # MatchText uses the field's full-text index when one exists
+    if not keywords:
+        return None
+    return Filter(must=[
+        FieldCondition(key=k, match=MatchText(text=v))
+        for k, v in keywords.items()
+    ])
 
 
 class QdrantStore:
 
     def __init__(self, default_collection: str = None):
-        self.client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+        client_kwargs = dict(
+            url=QDRANT_URL,
+            api_key=QDRANT_API_KEY or None,
+            prefer_grpc=QDRANT_PREFER_GRPC,
+            grpc_port=QDRANT_GRPC_PORT,
+            timeout=QDRANT_TIMEOUT
+        )
+        self.client = QdrantClient(**client_kwargs)
+        self.aclient = AsyncQdrantClient(**client_kwargs)
         self.default_collection = default_collection or cfg.DEFAULT_COLLECTION
 
         self._collections_cache: Optional[List[Dict[str, Any]]] = None
         self._collections_cache_ts: float = 0
 
-        self._vectors_count_cache: Dict[str, Dict[str, Any]] = {} 
+        self._vectors_count_cache: Dict[str, Dict[str, Any]] = {}
+        self._count_refreshing: Set[str] = set()
+        self._count_lock = threading.Lock()
+
+        # Collections confirmed to exist; only create/delete change it
+        self._known_collections: Set[str] = set()
+        # Whether each collection has the named sparse vector configured
+        self._sparse_support: Dict[str, bool] = {}
+        # Identical concurrent searches share one request
+        self.search_flights = SingleFlight()
 
     # -----------------------------
     # Internal cache management
@@ -37,7 +144,25 @@ class QdrantStore:
         try:
             collections_info = self.client.get_collections().collections
         except Exception:
+            collections_info = None
+        self._store_collections(collections_info, now)
+
+    async def _arefresh_collections_cache(self) -> None:
+        now = time.time()
+        if self._collections_cache and now - self._collections_cache_ts < COLLECTION_CACHE_TTL:
+            return
+
+        try:
+            collections_info = (await self.aclient.get_collections()).collections
+        except Exception:
+            collections_info = None
+        self._store_collections(collections_info, now)
+
+    def _store_collections(self, collections_info: Optional[List[Any]], now: float) -> None:
+        if collections_info is None:
             collections_info = []
+        else:
+            self._known_collections = {getattr(c, "name", "unknown") for c in collections_info}
 
         result = []
         for c in collections_info:
@@ -51,30 +176,144 @@ class QdrantStore:
 
     def _update_vectors_count_cache(self, collection: str) -> None:
         try:
-            count = self.client.count(collection_name=collection).count
+            count = self.client.count(collection_name=collection, exact=False).count
         except Exception:
             count = None
         self._vectors_count_cache[collection] = {"count": count, "ts": time.time()}
 
+    def _schedule_count_refresh(self, names: List[str]) -> None:
+        with self._count_lock:
+            names = [n for n in names if n not in self._count_refreshing]
+            self._count_refreshing.update(names)
+        if names:
+            threading.Thread(target=self._refresh_counts, args=(names,), daemon=True).start()
+
+    def _refresh_counts(self, names: List[str]) -> None:
+        try:
+            for name in names:
+                self._update_vectors_count_cache(name)
+        finally:
+            with self._count_lock:
+                self._count_refreshing.difference_update(names)
+
     # -----------------------------
     # Collection operations
     # -----------------------------
-    def create_collection_if_missing(self, name: str, vector_size: int = None) -> None:
-        self._refresh_collections_cache()
-        vector_size = vector_size or DEFAULT_VECTOR_SIZE
-        existing_names = [c["name"] for c in (self._collections_cache or [])]
-        if name not in existing_names:
+    @staticmethod
+    def _quantization_config(kind: str, always_ram: bool) -> Optional[Any]:
+        kind = (kind or "none").lower()
+        if kind == "none":
+            return None
+        if kind == "scalar":
+            return qm.ScalarQuantization(
+                scalar=qm.ScalarQuantizationConfig(type=qm.ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+            )
+        if kind == "binary":
+            return qm.BinaryQuantization(binary=qm.BinaryQuantizationConfig(always_ram=always_ram))
+        raise ValueError(f"Invalid quantization '{kind}'. Must be 'none', 'scalar' or 'binary'.")
+
+    def _collection_config(self, vector_size: int, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        options = options or {}
+        on_disk = options.get("on_disk", VECTORS_ON_DISK)
+        config = {
+            "vectors_config": qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE, on_disk=on_disk),
+        }
+
+        quantization = self._quantization_config(
+            options.get("quantization", COLLECTION_QUANTIZATION),
+            options.get("quantization_always_ram", QUANTIZATION_ALWAYS_RAM)
+        )
+        if quantization is not None:
+            config["quantization_config"] = quantization
+
+        hnsw_m = options.get("hnsw_m", HNSW_M)
+        hnsw_ef = options.get("hnsw_ef_construct", HNSW_EF_CONSTRUCT)
+        hnsw_on_disk = options.get("hnsw_on_disk", HNSW_ON_DISK)
+        if hnsw_m or hnsw_ef or hnsw_on_disk:
+            config["hnsw_config"] = qm.HnswConfigDiff(
+                m=hnsw_m or None,
+                ef_construct=hnsw_ef or None,
+                on_disk=hnsw_on_disk or None
+            )
+
+        if SPARSE_VECTORS_ENABLED:
+            # Documents carry BM25 term weights; Qdrant applies IDF at query time
+            config["sparse_vectors_config"] = {
+                SPARSE_VECTOR_NAME: qm.SparseVectorParams(modifier=qm.Modifier.IDF)
+            }
+        return config
+
+    @staticmethod
+    def payload_indexes(source_types: Optional[List[str]] = None,
+                        text_index_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        fields = PAYLOAD_TEXT_INDEX_FIELDS if text_index_fields is None else text_index_fields
+        indexes: Dict[str, Any] = {f: TEXT_INDEX_SCHEMA for f in fields}
+        indexes.update(PAYLOAD_INDEXES["*"])
+        for source_type in source_types or []:
+            if source_type not in PAYLOAD_INDEXES or source_type == "*":
+                raise ValueError(f"Unknown source_type '{source_type}'. Known: {sorted(set(PAYLOAD_INDEXES) - {'*'})}")
+            indexes.update(PAYLOAD_INDEXES[source_type])
+        return indexes
+
+    async def aapply_payload_indexes(self, name: str, source_types: Optional[List[str]] = None,
+                                     text_index_fields: Optional[List[str]] = None) -> List[str]:
+        indexes = self.payload_indexes(source_types, text_index_fields)
+        for field, schema in indexes.items():
             try:
-                self.client.create_collection(
-                    collection_name=name,
-                    vectors_config=qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
-                )
+                await self.aclient.create_payload_index(collection_name=name, field_name=field, field_schema=schema)
             except Exception as e:
+                self._raise_if_missing(name, e)
+                raise
+        return list(indexes)
+
+    def _collection_created(self, name: str) -> None:
+        self._known_collections.add(name)
+        self._collections_cache = None
+        self._vectors_count_cache.setdefault(name, {"count": 0, "ts": time.time()})
+
+    def _forget_collection(self, name: str) -> None:
+        # Another worker may have deleted it: the next create looks it up again
+        self._known_collections.discard(name)
+        self._sparse_support.pop(name, None)
+        self._collections_cache = None
+
+    async def acreate_collection_if_missing(self, name: str, vector_size: int = None,
+                                            source_type: Optional[str] = None,
+                                            text_index_fields: Optional[List[str]] = None,
+                                            options: Optional[Dict[str, Any]] = None) -> None:
+        if name in self._known_collections:
+            return
+
+        await self._arefresh_collections_cache()
+        if name in self._known_collections:
+            return
+
+        vector_size = vector_size or DEFAULT_VECTOR_SIZE
+        try:
+            await self.aclient.create_collection(collection_name=name, **self._collection_config(vector_size, options))
+            await self.aapply_payload_indexes(name, [source_type] if source_type in PAYLOAD_INDEXES else None,
+                                              text_index_fields)
+            self._sparse_support[name] = SPARSE_VECTORS_ENABLED
+        except Exception as e:
+            if "already exists" not in str(e).lower():
                 raise RuntimeError(f"Failed to create collection '{name}': {e}")
 
-            # Invalidate caches
-            self._collections_cache = None
-            self._vectors_count_cache[name] = {"count": 0, "ts": time.time()}
+        self._collection_created(name)
+
+    @staticmethod
+    def _info_has_sparse(info: Any) -> bool:
+        sparse = getattr(info.config.params, "sparse_vectors", None) or {}
+        return SPARSE_VECTOR_NAME in sparse
+
+    async def ahas_sparse(self, name: str) -> bool:
+        if name not in self._sparse_support:
+            try:
+                info = await self.aclient.get_collection(collection_name=name)
+            except Exception as e:
+                self._raise_if_missing(name, e)
+                raise
+            self._sparse_support[name] = self._info_has_sparse(info)
+        return self._sparse_support[name]
 
     def delete_collection(self, name: str) -> None:
         self._refresh_collections_cache()
@@ -84,75 +323,259 @@ class QdrantStore:
                 self.client.delete_collection(collection_name=name)
             except Exception as e:
                 raise RuntimeError(f"Failed to delete collection '{name}': {e}")
+            self._known_collections.discard(name)
+            self._sparse_support.pop(name, None)
             self._collections_cache = None
             self._vectors_count_cache.pop(name, None)
+            query_cache.invalidate(name)
 
     def list_collections(self) -> List[Dict[str, Any]]:
         self._refresh_collections_cache()
         now = time.time()
+        stale = []
         for c in self._collections_cache or []:
             name = c["name"]
-            cached = self._vectors_count_cache.get(name, {})
-            if not cached or now - cached.get("ts", 0) > COLLECTION_CACHE_TTL:
+            cached = self._vectors_count_cache.get(name)
+            if cached is None:
                 self._update_vectors_count_cache(name)
-                c["vectors_count"] = self._vectors_count_cache[name]["count"]
+                cached = self._vectors_count_cache[name]
+            elif now - cached.get("ts", 0) > COLLECTION_CACHE_TTL:
+                # Serve the last known (approximate) count, refresh it off the request path
+                stale.append(name)
+            c["vectors_count"] = cached["count"]
+
+        if stale:
+            self._schedule_count_refresh(stale)
         return self._collections_cache or []
 
     # -----------------------------
     # Vector operations
     # -----------------------------
-    def upsert(self, collection: str, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]) -> None:
+    @staticmethod
+    def _validate_points(ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]],
+                         sparse_vectors: Optional[List[SparseVectorData]]) -> None:
         if not ids or not vectors or len(ids) != len(vectors):
             raise ValueError("IDs and vectors must be non-empty and of equal length.")
         if len(metadatas) != len(ids):
             raise ValueError("Metadatas length must match IDs length.")
+        if sparse_vectors is not None and len(sparse_vectors) != len(ids):
+            raise ValueError("Sparse vectors length must match IDs length.")
 
-        self.create_collection_if_missing(collection, vector_size=len(vectors[0]))
+    @staticmethod
+    def _points(ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]],
+                sparse_vectors: Optional[List[SparseVectorData]] = None) -> List[qm.PointStruct]:
+        if sparse_vectors is None:
+            return [
+                qm.PointStruct(id=str(i), vector=v, payload=m)
+                for i, v, m in zip(ids, vectors, metadatas)
+            ]
 
-        points = [
-            qm.PointStruct(id=str(i), vector=v, payload=m)
-            for i, v, m in zip(ids, vectors, metadatas)
-        ]
-        self.client.upsert(collection_name=collection, points=points)
+        points = []
+        for i, v, m, (indices, values) in zip(ids, vectors, metadatas, sparse_vectors):
+            vector: Dict[str, Any] = {"": v}
+            if indices:
+                vector[SPARSE_VECTOR_NAME] = qm.SparseVector(indices=indices, values=values)
+            points.append(qm.PointStruct(id=str(i), vector=vector, payload=m))
+        return points
 
-        self._update_vectors_count_cache(collection)
-        self._collections_cache = None
+    async def aupsert(self, collection: str, ids: List[str], vectors: List[List[float]],
+                      metadatas: List[Dict[str, Any]],
+                      sparse_vectors: Optional[List[SparseVectorData]] = None,
+                      source_type: Optional[str] = None,
+                      collection_options: Optional[Dict[str, Any]] = None) -> None:
+        self._validate_points(ids, vectors, metadatas, sparse_vectors)
+        try:
+            for attempt in range(2):
+                await self.acreate_collection_if_missing(collection, vector_size=len(vectors[0]),
+                                                         source_type=source_type, options=collection_options)
+                try:
+                    with_sparse = sparse_vectors is not None and await self.ahas_sparse(collection)
+                    points = self._points(ids, vectors, metadatas, sparse_vectors if with_sparse else None)
+                    await self.aclient.upsert(collection_name=collection, points=points)
+                    return
+                except Exception as e:
+                    if attempt or not _is_not_found(e):
+                        raise
+                    self._forget_collection(collection)
+        finally:
+            query_cache.invalidate(collection)
+
+    @staticmethod
+    def _build_filter(filter: Optional[Any]) -> Optional[Filter]:
+        if not filter:
+            return None
+        if isinstance(filter, dict):
+            must_conditions = [
+                FieldCondition(key=k, match=MatchValue(value=v))
+                for k, v in filter.items()
+            ]
+            return Filter(must=must_conditions)
+        if isinstance(filter, Filter):
+            return filter
+        raise ValueError(f"Invalid filter type: {type(filter)}. Must be dict or qdrant_client.models.Filter.")
+
+    @staticmethod
+    def _search_params(oversampling: Optional[float] = None, rescore: Optional[bool] = None) -> Optional[qm.SearchParams]:
+        if oversampling is None and rescore is None and not SEARCH_OVERSAMPLING and not SEARCH_HNSW_EF:
+            return None
+        oversampling = oversampling if oversampling is not None else SEARCH_OVERSAMPLING
+        rescore = rescore if rescore is not None else SEARCH_RESCORE
+        return qm.SearchParams(
+            hnsw_ef=SEARCH_HNSW_EF or None,
+            quantization=qm.QuantizationSearchParams(rescore=rescore, oversampling=oversampling or None)
+        )
 
-    def search_by_vector(
+    def _raise_if_missing(self, coll: str, e: Exception) -> None:
+        if _is_not_found(e):
+            self._forget_collection(coll)
+            raise CollectionNotFoundError(coll) from e
+
+    @staticmethod
+    def _hits(results: List[Any]) -> List[Dict[str, Any]]:
+        return [{"id": h.id, "score": h.score, "payload": h.payload} for h in results]
+
+    async def _coalesced(self, key: tuple, search) -> List[Dict[str, Any]]:
+        hits = await self.search_flights.do(key, search)
+        # Callers may annotate their hits (e.g. "collection"): give each its own dicts
+        return [dict(h) for h in hits]
+
+    @staticmethod
+    def _filter_key(filter: Optional[Any]) -> str:
+        return json.dumps(filter, sort_keys=True, default=str)
+
+    async def asearch_by_vector(
         self,
         vector: List[float],
         collection: Optional[str] = None,
         top_k: int = 5,
-        filter: Optional[Any] = None
+        filter: Optional[Any] = None,
+        ensure_collection: bool = False,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
         coll = collection or self.default_collection
-        self.create_collection_if_missing(coll, vector_size=len(vector))
-
-        filter_obj = None
-        if filter:
-            if isinstance(filter, dict):
-                must_conditions = [
-                    FieldCondition(key=k, match=MatchValue(value=v))
-                    for k, v in filter.items()
-                ]
-                filter_obj = Filter(must=must_conditions)
-            elif isinstance(filter, Filter):
-                filter_obj = filter
-            else:
-                raise ValueError(f"Invalid filter type: {type(filter)}. Must be dict or qdrant_client.models.Filter.")
-
-        results = self.client.search(
-            collection_name=coll,
-            query_vector=vector,
-            limit=top_k,
-            query_filter=filter_obj
-        )
+        key = ("dense", coll, tuple(vector), top_k, self._filter_key(filter), ensure_collection, oversampling, rescore)
+        return await self._coalesced(key, lambda: self._asearch_by_vector(
+            vector, coll, top_k, filter, ensure_collection, oversampling, rescore
+        ))
+
+    async def _asearch_by_vector(self, vector: List[float], coll: str, top_k: int, filter: Optional[Any],
+                                 ensure_collection: bool, oversampling: Optional[float],
+                                 rescore: Optional[bool]) -> List[Dict[str, Any]]:
+        if ensure_collection:
+            await self.acreate_collection_if_missing(coll, vector_size=len(vector))
 
-        return [{"id": h.id, "score": h.score, "payload": h.payload} for h in results]
-    
-    def point_exists(self, collection: str, point_id: str) -> bool:
         try:
-            pt = self.client.get_point(collection_name=collection, id=str(point_id))
-            return pt is not None
-        except Exception:
-            return False
+            response = await self.aclient.query_points(
+                collection_name=coll,
+                query=vector,
+                limit=top_k,
+                query_filter=self._build_filter(filter),
+                search_params=self._search_params(oversampling, rescore)
+            )
+        except Exception as e:
+            self._raise_if_missing(coll, e)
+            raise
+
+        return self._hits(response.points)
+
+    async def asearch_hybrid(
+        self,
+        vector: List[float],
+        sparse: SparseVectorData,
+        collection: Optional[str] = None,
+        top_k: int = 5,
+        filter: Optional[Any] = None,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        coll = collection or self.default_collection
+        key = ("hybrid", coll, tuple(vector), tuple(sparse[0]), tuple(sparse[1]), top_k,
+               self._filter_key(filter), oversampling, rescore)
+        return await self._coalesced(key, lambda: self._asearch_hybrid(
+            vector, sparse, coll, top_k, filter, oversampling, rescore
+        ))
+
+    async def _asearch_hybrid(self, vector: List[float], sparse: SparseVectorData, coll: str, top_k: int,
+                              filter: Optional[Any], oversampling: Optional[float],
+                              rescore: Optional[bool]) -> List[Dict[str, Any]]:
+        indices, values = sparse
+        if not indices or not await self.ahas_sparse(coll):
+            return await self.asearch_by_vector(vector, coll, top_k=top_k, filter=filter,
+                                                oversampling=oversampling, rescore=rescore)
+
+        prefetch_limit = top_k * HYBRID_PREFETCH_FACTOR
+        try:
+            response = await self.aclient.query_points(
+                collection_name=coll,
+                prefetch=[
+                    qm.Prefetch(query=vector, limit=prefetch_limit,
+                                params=self._search_params(oversampling, rescore)),
+                    qm.Prefetch(
+                        query=qm.SparseVector(indices=indices, values=values),
+                        using=SPARSE_VECTOR_NAME,
+                        limit=prefetch_limit
+                    ),
+                ],
+                query=qm.FusionQuery(fusion=qm.Fusion.RRF),
+                query_filter=self._build_filter(filter),
+                limit=top_k
+            )
+        except Exception as e:
+            self._raise_if_missing(coll, e)
+            raise
+
+        return self._hits(response.points)
+
+    async def asearch_collections(
+        self,
+        vector: List[float],
+        collections: List[str],
+        top_k: int = 5,
+        filter: Optional[Any] = None,
+        sparse: Optional[SparseVectorData] = None,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None
+    ) -> List[List[Dict[str, Any]]]:
+        tuning = {"oversampling": oversampling, "rescore": rescore}
+        # RRF and cosine scores are not comparable: fall back to dense search for every
+        # collection unless all of them carry the sparse vector
+        if sparse is not None and sparse[0]:
+            supported = await asyncio.gather(*(self.ahas_sparse(coll) for coll in collections))
+            if not all(supported):
+                sparse = None
+        if sparse is not None:
+            searches = (self.asearch_hybrid(vector, sparse, coll, top_k=top_k, filter=filter, **tuning)
+                        for coll in collections)
+        else:
+            searches = (self.asearch_by_vector(vector, coll, top_k=top_k, filter=filter, **tuning)
+                        for coll in collections)
+
+        per_collection = await asyncio.gather(*searches)
+        for coll, hits in zip(collections, per_collection):
+            for h in hits:
+                h["collection"] = coll
+        return list(per_collection)
+
+    async def aexisting_content_hashes(self, collection: str, ids: List[str]) -> Dict[str, Optional[str]]:
+        found: Dict[str, Optional[str]] = {}
+        for i in range(0, len(ids), RETRIEVE_BATCH_SIZE):
+            try:
+                points = await self.aclient.retrieve(
+                    collection_name=collection,
+                    ids=[str(p) for p in ids[i:i + RETRIEVE_BATCH_SIZE]],
+                    with_payload=qm.PayloadSelectorInclude(include=["content_hash"]),
+                    with_vectors=False
+                )
+            except Exception:
+                return found
+            for p in points:
+                found[str(p.id)] = (p.payload or {}).get("content_hash")
+        return found
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    async def aclose(self) -> None:
+        await self.aclient.close()
+        self.client.close()
@@ -0,0 +1,218 @@
+"""
+query_cache.py
+
+In-process cache for search results:
+- Keys cover the normalized query and every search parameter
+- TTL plus LRU bound by entry count
+- Invalidated per collection by QdrantStore writes and deletes, through
+  generation counters in SQLite that every worker checks
+- Hit/miss counters for monitoring
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import defaults as cfg
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+
+    def __init__(self, max_entries: int = 0, ttl_seconds: float = 60.0, shared_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_path = shared_path or None
+
+        # key -> (expires_at, collections, generations, value)
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, ...], Tuple[int, ...], Any]]" = OrderedDict()
+        self._by_collection: Dict[str, Set[str]] = {}
+        # Bumped on every invalidation: an entry whose generations changed since it
+        # was searched is stale. Only used without shared_path (single worker).
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def key(kind: str, query: str, collections: Iterable[str], **params: Any) -> str:
+        normalized = " ".join(query.split()).casefold()
+        raw = json.dumps([kind, normalized, sorted(collections), params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # -----------------------------
+    # Generations (SQLite, shared by all workers)
+    # -----------------------------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.shared_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.shared_path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS generations (collection TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def open(self) -> None:
+        # Called at startup so a bad QUERY_CACHE_PATH fails there, not on the first query
+        if not self.enabled or self.shared_path is None:
+            return
+        with self._lock:
+            try:
+                self._db()
+            except (OSError, sqlite3.Error) as e:
+                raise RuntimeError(
+                    f"Cannot open query cache generations at '{self.shared_path}': {e}. Set QUERY_CACHE_PATH "
+                    "to a writable path (empty is only safe with one worker) or QUERY_CACHE_ENABLED=false."
+                ) from e
+
+    def _current(self, collections: Iterable[str]) -> Tuple[int, ...]:
+        # Caller holds the lock
+        collections = list(collections)
+        if not collections:
+            return ()
+        if self.shared_path is None:
+            return tuple(self._generations.get(c, 0) for c in collections)
+        placeholders = ",".join("?" * len(collections))
+        rows = self._db().execute(
+            f"SELECT collection, generation FROM generations WHERE collection IN ({placeholders})", collections
+        ).fetchall()
+        found = dict(rows)
+        return tuple(found.get(c, 0) for c in collections)
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for coll in entry[1]:
+            keys = self._by_collection.get(coll)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_collection[coll]
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                try:
+                    fresh = entry[2] == self._current(entry[1])
+                except sqlite3.Error as e:
+                    # Without the counters another worker's write can't be ruled out
+                    logger.warning("Query cache generations unavailable: %s", e)
+                    fresh = False
+                if fresh:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[3]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def generations(self, collections: Iterable[str]) -> Optional[Tuple[int, ...]]:
+        # None when the counters can't be read: the result must not be cached
+        with self._lock:
+            try:
+                return self._current(collections)
+            except sqlite3.Error as e:
+                logger.warning("Query cache generations unavailable: %s", e)
+                return None
+
+    def put(self, key: str, collections: List[str], value: Any, generations: Tuple[int, ...]) -> None:
+        # generations are those read before the search: a write since then means
+        # the value may already be stale, so it is not stored
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                if generations != self._current(collections):
+                    return
+            except sqlite3.Error as e:
+                logger.warning("Query cache generations unavailable: %s", e)
+                return
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, tuple(collections), generations, value)
+            for coll in collections:
+                self._by_collection.setdefault(coll, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    async def get_or_search(self, key: str, collections: List[str], search: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        generations = self.generations(collections) if self.enabled else None
+        value = await search()
+        if generations is not None:
+            self.put(key, collections, value, generations)
+        return value
+
+    # -----------------------------
+    # Invalidation
+    # -----------------------------
+    def invalidate(self, collection: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.shared_path is None:
+                self._generations[collection] = self._generations.get(collection, 0) + 1
+            else:
+                try:
+                    self._db().execute(
+                        "INSERT INTO generations (collection, generation) VALUES (?, 1) "
+                        "ON CONFLICT(collection) DO UPDATE SET generation = generation + 1",
+                        (collection,)
+                    )
+                except sqlite3.Error as e:
+                    # Other workers keep their entries until QUERY_CACHE_TTL_SECONDS at most
+                    logger.error("Query cache invalidation of '%s' not shared: %s", collection, e)
+            for key in list(self._by_collection.get(collection, ())):
+                self._drop(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_collection.clear()
+            self.hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "shared_path": self.shared_path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+query_cache = QueryCache(
+    max_entries=cfg.QUERY_CACHE_SIZE if cfg.QUERY_CACHE_ENABLED else 0,
+    ttl_seconds=cfg.QUERY_CACHE_TTL_SECONDS,
+    shared_path=cfg.QUERY_CACHE_PATH
+)
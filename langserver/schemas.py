@@ -2,7 +2,7 @@
 from uuid import uuid4
 from datetime import datetime, timezone
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 import defaults as cfg
 
 # -----------------------------
@@ -47,6 +47,20 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+# -----------------------------
+# Collection storage options (used when an ingest creates the collection)
+# -----------------------------
+Quantization = Literal["none", "scalar", "binary"]  # scalar = int8
+
+class CollectionOptions(BaseModel):
+
+    quantization: Optional[Quantization] = None
+    quantization_always_ram: Optional[bool] = None
+    on_disk: Optional[bool] = None
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    hnsw_on_disk: Optional[bool] = None
+
 # -----------------------------
 # Generic text ingestion
 # -----------------------------
@@ -59,6 +73,7 @@ class IngestItem(BaseModel):
 class IngestRequest(BaseModel):
 
     collection: Optional[str] = cfg.DEFAULT_COLLECTION
+    collection_options: Optional[CollectionOptions] = None
     items: List[IngestItem]
 
 # -----------------------------
@@ -76,7 +91,11 @@ class LogEntry(BaseModel):
 class LogIngestRequest(BaseModel):
 
     collection: Optional[str] = cfg.DEFAULT_COLLECTION
+    collection_options: Optional[CollectionOptions] = None
     logs: List[LogEntry]
+    group: Optional[bool] = None            # multi-line chunks per vm_id and time window
+    window_seconds: Optional[int] = None
+    lines_per_chunk: Optional[int] = None
 
 # -----------------------------
 # Database row ingestion
@@ -91,8 +110,22 @@ class DBRow(BaseModel):
 class DBIngestRequest(BaseModel):
 
     collection: Optional[str] = cfg.DEFAULT_COLLECTION
+    collection_options: Optional[CollectionOptions] = None
     rows: List[DBRow]
 
+class DBQueryIngestRequest(BaseModel):
+
+    collection: Optional[str] = cfg.DEFAULT_COLLECTION
+    collection_options: Optional[CollectionOptions] = None
+    table: Optional[str] = None                  # e.g. "public.tickets"
+    query: Optional[str] = None                  # single SELECT statement, used instead of table
+    id_column: Optional[str] = None              # stable row key (required with watermark_column); defaults to a hash of the row
+    text_columns: Optional[List[str]] = None     # defaults to every column
+    metadata_columns: Optional[List[str]] = None
+    watermark_column: Optional[str] = None       # e.g. "updated_at", for incremental runs
+    since: Optional[Any] = None                  # only rows with watermark_column > since
+    fetch_size: Optional[int] = None
+
 # -----------------------------
 # RSS / News ingestion
 # -----------------------------
@@ -108,6 +141,7 @@ class RSSArticle(BaseModel):
 class RSSIngestRequest(BaseModel):
 
     collection: Optional[str] = cfg.DEFAULT_COLLECTION
+    collection_options: Optional[CollectionOptions] = None
     articles: List[RSSArticle]
 
 # -----------------------------
@@ -116,6 +150,7 @@ class RSSIngestRequest(BaseModel):
 class FetchRSSRequest(BaseModel):
     urls: List[str]
     collection: Optional[str] = cfg.DEFAULT_COLLECTION
+    collection_options: Optional[CollectionOptions] = None
 
 
 # -----------------------------
@@ -134,6 +169,7 @@ class SocialPost(BaseModel):
 class SocialIngestRequest(BaseModel):
 
     collection: Optional[str] = cfg.DEFAULT_COLLECTION
+    collection_options: Optional[CollectionOptions] = None
     posts: List[SocialPost]
 
 # -----------------------------
@@ -147,7 +183,10 @@ class QueryRequest(BaseModel):
     llm_model: Optional[str] = None
     embed_model: Optional[str] = None
     filters: Optional[Dict[str, Any]] = {}
+    oversampling: Optional[float] = None
+    rescore: Optional[bool] = None
     return_raw: Optional[bool] = False
+    stream: Optional[bool] = False  # SSE: results event first, then the LLM answer token by token
 
 # -----------------------------
 # Semantic query-hybrid
@@ -161,7 +200,10 @@ class HybridQueryRequest(BaseModel):
     embed_model: Optional[str] = None
     keyword_filters: Optional[Dict[str, str]] = {}
     boost_recent_days: Optional[int] = None
+    oversampling: Optional[float] = None
+    rescore: Optional[bool] = None
     return_raw: Optional[bool] = False
+    stream: Optional[bool] = False  # SSE: results event first, then the LLM answer token by token
 
 # -----------------------------
 # Semantic query-multi-collections
@@ -174,7 +216,10 @@ class MultiQueryRequest(BaseModel):
     embed_model: Optional[str] = None
     filters: Optional[Dict[str, Any]] = None
     hybrid_keywords: Optional[List[str]] = None
+    oversampling: Optional[float] = None
+    rescore: Optional[bool] = None
     return_raw: Optional[bool] = False
+    stream: Optional[bool] = False  # SSE: results event first, then the LLM answer token by token
 
 # -----------------------------
 # Collection management
@@ -186,6 +231,18 @@ class CollectionResponse(BaseModel):
 class DeleteCollectionRequest(BaseModel):
     collection: str
 
+class PayloadIndexRequest(BaseModel):
+    collection: str
+    source_types: Optional[List[str]] = None  # e.g. ["log", "rss"]; shared indexes are always applied
+    text_index_fields: Optional[List[str]] = None
+
+# -----------------------------
+# Background jobs
+# -----------------------------
+class JobSubmitRequest(BaseModel):
+    kind: str  # texts | logs | db | db_query | rss | social | fetch_rss
+    payload: Dict[str, Any]  # body of the matching ingest endpoint
+
 # -----------------------------
 # DEBUG: Endpoints
 # -----------------------------
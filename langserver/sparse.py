@@ -0,0 +1,60 @@
+"""
+sparse.py
+
+Local sparse term vectors for hybrid retrieval:
+- Word tokenization with a small English stopword list
+- Hashed term ids (no vocabulary, no model download)
+- BM25 term-frequency weighting for documents
+- IDF is applied by Qdrant (sparse vector modifier=IDF)
+"""
+
+import re
+import hashlib
+from collections import Counter
+from typing import List, Tuple
+
+import defaults as cfg
+
+BM25_K1 = cfg.BM25_K1
+BM25_B = cfg.BM25_B
+BM25_AVG_DOC_LEN = cfg.BM25_AVG_DOC_LEN
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have if in into is it its of on or
+such that the their then there these they this to was were will with
+""".split())
+
+SparseVectorData = Tuple[List[int], List[float]]
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _term_id(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _to_sparse(weights: Counter) -> SparseVectorData:
+    merged: dict = {}
+    for token, w in weights.items():
+        idx = _term_id(token)
+        merged[idx] = merged.get(idx, 0.0) + w
+    indices = sorted(merged)
+    return indices, [merged[i] for i in indices]
+
+
+def document_vector(text: str) -> SparseVectorData:
+    tokens = tokenize(text)
+    if not tokens:
+        return [], []
+
+    tf = Counter(tokens)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / BM25_AVG_DOC_LEN)
+    return _to_sparse(Counter({t: n * (BM25_K1 + 1) / (n + norm) for t, n in tf.items()}))
+
+
+def query_vector(text: str) -> SparseVectorData:
+    return _to_sparse(Counter(dict.fromkeys(tokenize(text), 1.0)))
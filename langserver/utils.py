@@ -1,6 +1,9 @@
 
 import os
 import io
+import codecs
+from datetime import datetime, timezone
+from typing import Iterator, Optional
 from fastapi import Header, HTTPException
 from dotenv import load_dotenv
 import docx
@@ -42,6 +45,38 @@ def parse_file_to_text(content: bytes, filename: str) -> str:
     # Default fallback: decode as UTF-8
     return content.decode("utf-8", errors="ignore")
 
+def iter_file_text(path: str, filename: str, block_size: int = 64 * 1024) -> Iterator[str]:
+    # Yields text segments in document order; concatenated they give the same
+    # text as parse_file_to_text, but only one page/block is held at a time.
+    name = filename.lower()
+
+    if name.endswith(".pdf"):
+        reader = PdfReader(path)
+        for i, page in enumerate(reader.pages):
+            yield ("\n\n" if i else "") + (page.extract_text() or "")
+        return
+
+    if name.endswith(".docx"):
+        doc = docx.Document(path)
+        for i, p in enumerate(doc.paragraphs):
+            yield ("\n\n" if i else "") + p.text
+        return
+
+    if name.endswith(".html") or name.endswith(".htm"):
+        with open(path, "rb") as f:
+            soup = BeautifulSoup(f, "html.parser")
+        yield soup.get_text(separator="\n")
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield decoder.decode(block)
+        yield decoder.decode(b"", final=True)
+
 # -------------------------
 # Text Helpers
 # -------------------------
@@ -51,6 +86,24 @@ def clean_text(text: str) -> str:
     text = re.sub(r'\n+', '\n', text)
     return text
 
+_LOG_VARIABLE_RE = re.compile(
+    r"[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}"  # uuids
+    r"|0x[0-9a-fA-F]+"                                          # hex values
+    r"|\d+(?:[.:]\d+)*"                                         # numbers, IPs, times
+)
+
+def log_template(message: str) -> str:
+    # Masks the variable parts of a log line, so repeats of one statement compare equal
+    return _LOG_VARIABLE_RE.sub("<*>", message)
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+
+    try:
+        ts = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
 
 def split_lines_to_chunks(lines: list, chunk_size: int = 100) -> list:
 